@@ -3,6 +3,11 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Production: uvicorn core.asgi:application --workers 4
+(or gunicorn core.asgi:application -k uvicorn.workers.UvicornWorker).
+Under ASGI the async endpoints in mainapp.async_views do not hold a thread
+while waiting for the database or Telegram.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
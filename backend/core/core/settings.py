@@ -1,13 +1,35 @@
 import os
+import sys
 from pathlib import Path
 
-
+from django.core.exceptions import ImproperlyConfigured
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Профиль окружения: development (по умолчанию) или production.
+# В production нет debug_toolbar, схемы API и Browsable API, соединения
+# с базой переиспользуются, сессии читаются из кэша.
+DJANGO_ENV = os.getenv('DJANGO_ENV', 'development')
+PRODUCTION = DJANGO_ENV == 'production'
+TESTING = sys.argv[1:2] == ['test']
+
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', 'replace-me')
-DEBUG = True
-ALLOWED_HOSTS = ['*']
+if PRODUCTION and SECRET_KEY == 'replace-me':
+    raise ImproperlyConfigured('DJANGO_SECRET_KEY обязателен в production')
+DEBUG = not PRODUCTION
+ALLOWED_HOSTS = os.getenv('DJANGO_ALLOWED_HOSTS', '' if PRODUCTION else '*').split(',')
+if PRODUCTION and not any(ALLOWED_HOSTS):
+    raise ImproperlyConfigured('DJANGO_ALLOWED_HOSTS обязателен в production')
+
+# Адрес API для абсолютных ссылок в ответах (изображения, пагинация):
+# не зависит от заголовка Host запроса (mainapp.links)
+PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL', '' if PRODUCTION else 'http://localhost:8000')
+if PRODUCTION and not PUBLIC_BASE_URL:
+    raise ImproperlyConfigured('PUBLIC_BASE_URL обязателен в production')
+
+# Документация API (drf-spectacular): /api/v1.0/schema/, docs/, redoc/
+API_DOCS_ENABLED = not PRODUCTION
 
 
 INSTALLED_APPS = [
@@ -18,22 +40,30 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
-    'debug_toolbar',
     'django_filters',
     'mainapp',
 ]
 
 MIDDLEWARE = [
+    'mainapp.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'mainapp.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'mainapp.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if not PRODUCTION:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.middleware.common.CommonMiddleware') + 1,
+        'debug_toolbar.middleware.DebugToolbarMiddleware',
+    )
+
 REST_FRAMEWORK = {
     # Права доступа
     'DEFAULT_PERMISSION_CLASSES': [
@@ -44,13 +74,27 @@ REST_FRAMEWORK = {
     ],
     
     # Пагинация
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'mainapp.pagination.MenuPagination',
     'PAGE_SIZE': 30,
     "COERCE_DECIMAL_TO_STRING": False,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+
+    # JSON через orjson (тот же JSON, что у JSONRenderer; отличия у float — в mainapp.renderers)
+    'DEFAULT_RENDERER_CLASSES': [
+        'mainapp.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'mainapp.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     
 }
 
+if PRODUCTION:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = ['mainapp.renderers.ORJSONRenderer']
+
 
 
 ROOT_URLCONF = 'core.urls'
@@ -71,6 +115,17 @@ TEMPLATES = [
 ]
 
 
+if PRODUCTION:
+    # Шаблоны (админка) компилируются один раз на процесс
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
+
 INTERNAL_IPS = ['127.0.0.1',]
 
 WSGI_APPLICATION = 'core.wsgi.application'
@@ -82,9 +137,127 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL: чтение не блокируется записью; synchronous=NORMAL в WAL
+            # безопасен при сбое процесса и не делает fsync на каждый коммит.
+            # Рядом с базой живут файлы db.sqlite3-wal и db.sqlite3-shm: каталог
+            # (а не только файл базы) должен быть доступен на запись и лежать
+            # на одном томе с ними; копировать базу — вместе с -wal или после
+            # PRAGMA wal_checkpoint. Сетевые ФС WAL не поддерживают
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'  # 256 МБ
+                'PRAGMA cache_size=-20000;'  # ~20 МБ на соединение
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            # Транзакция сразу берёт блокировку записи: вместо мгновенного
+            # «database is locked» при повышении блокировки — ожидание
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,  # busy_timeout, секунды
+        },
     }
 }
 
+if PRODUCTION:
+    # Соединение живёт между запросами вместо открытия на каждый запрос
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+
+# Кэш: Redis в проде, память процесса для локальной разработки.
+# Инвалидация меню — смена версии в кэше (mainapp.cache): она должна быть
+# видна всем воркерам и management-командам, поэтому без общего кэша
+# production не запускается.
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'IGNORE_EXCEPTIONS': True,  # недоступный Redis не должен ронять API
+            },
+            'KEY_PREFIX': 'miniapp',
+        }
+    }
+elif not DEBUG:
+    raise ImproperlyConfigured('REDIS_URL обязателен вне DEBUG: кэш меню должен быть общим для процессов')
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+if PRODUCTION:
+    # Сессии (админка) читаются из кэша (Redis), база — только при промахе
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Время жизни закэшированных ответов меню (каталоги/товары), в секундах.
+# С Redis инвалидация происходит по сигналам, таймаут — лишь страховка.
+# Кэш в памяти процесса не видит смену версии из других процессов
+# (второй runserver, import_menu), поэтому там ответы и версии живут
+# недолго.
+MENU_CACHE_TIMEOUT = int(os.getenv('MENU_CACHE_TIMEOUT', 60 * 60 * 24 if REDIS_URL else 60))
+MENU_CACHE_VERSION_TIMEOUT = None if REDIS_URL else MENU_CACHE_TIMEOUT
+
+# Журнал изменений меню для GET /products/changes/: сколько записей журнала
+# разбирается за один ответ и сколько дней они хранятся (prune_menu_changes)
+MENU_CHANGES_PAGE_SIZE = 500
+MENU_CHANGES_RETENTION_DAYS = 30
+
+# Сжатие ответов (mainapp.middleware.CompressionMiddleware): тела меньше
+# порога не сжимаются — выигрыш меньше накладных расходов
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# GET /metrics (Prometheus): только с Authorization: Bearer <METRICS_TOKEN>.
+# Без токена метрики открыты лишь при DEBUG
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+if PRODUCTION and not METRICS_TOKEN:
+    raise ImproperlyConfigured('METRICS_TOKEN обязателен в production')
+
+# Журнал медленных SQL-запросов (mainapp.slowlog, сводка — manage.py
+# slow_queries). Пустое значение SLOW_QUERY_THRESHOLD_MS отключает журнал.
+SLOW_QUERY_THRESHOLD_MS = os.getenv('SLOW_QUERY_THRESHOLD_MS', '100')
+SLOW_QUERY_THRESHOLD_MS = float(SLOW_QUERY_THRESHOLD_MS) if SLOW_QUERY_THRESHOLD_MS else None
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', str(BASE_DIR / 'slow_queries.jsonl'))
+
+# Профилирование запросов (mainapp.profiling): каталог для .prof,
+# срок жизни токена X-Profile и лимит (профилей, за секунд)
+PROFILER_DIR = os.getenv('PROFILER_DIR', str(BASE_DIR / 'profiles'))
+PROFILER_TOKEN_MAX_AGE = 60 * 60
+PROFILER_RATE_LIMIT = (10, 60)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        # manage.py test не пишет в рабочий журнал (тесты журнала
+        # подключают свой обработчик)
+        'slow_queries': {'class': 'logging.NullHandler'} if TESTING else {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'formatter': 'message',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'mainapp.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -110,6 +283,16 @@ STATIC_ROOT = os.path.join(BASE_DIR.parent, "staticfiles")
 MEDIA_URL = "/staticmedia/"
 MEDIA_ROOT = os.path.join(BASE_DIR.parent, "staticmedia/")
 
+# Варианты изображений товаров: имя -> (ширина, высота, обрезать до размера)
+PRODUCT_IMAGE_VARIANTS = {
+    'thumbnail': (96, 96, True),
+    'card': (400, 400, True),
+    'detail': (1080, 1080, False),
+}
+
+# Ключи Product.meta, которые попадают в полнотекстовый поиск
+PRODUCT_SEARCH_META_KEYS = ['tags', 'ingredients', 'composition']
+
 
 # Описание для документации
 SPECTACULAR_SETTINGS = {
@@ -126,6 +309,22 @@ SPECTACULAR_SETTINGS = {
 }
 
 
+# Максимум заказов в одном запросе POST /orders/batch/
+ORDER_BATCH_MAX_SIZE = 100
+
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', 'BOT_TOKEN')
 PAYMENT_PROVIDER_TOKEN = os.getenv('PAYMENT_PROVIDER_TOKEN', 'PAYMENT_PROVIDER_TOKEN')
+
+# Telegram Bot API: таймауты (соединение, чтение) и размер пула соединений
+TELEGRAM_API_TIMEOUT = (3.05, 10)
+TELEGRAM_POOL_SIZE = 10
+
+# Outbox уведомлений: лимиты Telegram (сообщений в секунду) и повторы
+TELEGRAM_RATE_LIMIT_GLOBAL = 30
+TELEGRAM_RATE_LIMIT_PER_CHAT = 1
+TELEGRAM_OUTBOX_BATCH_SIZE = 100
+TELEGRAM_OUTBOX_MAX_ATTEMPTS = 8
+TELEGRAM_OUTBOX_BACKOFF_BASE = 2  # секунды, удваивается с каждой попыткой
+TELEGRAM_OUTBOX_BACKOFF_MAX = 15 * 60
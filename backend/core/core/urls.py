@@ -1,29 +1,40 @@
-import debug_toolbar
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-    SpectacularRedocView,
-)
+from mainapp.metrics import metrics_view
 
 
 urlpatterns = [
-    path('__debug__/', include(debug_toolbar.urls)),
-    
     # Эндпоинты админ-панели
     path('admin/', admin.site.urls),
-    
-    path('api/v1.0/schema/', SpectacularAPIView.as_view(), name='schema'), # JSON схема
-    path('api/v1.0/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'), # Swagger UI
-    path('api/v1.0/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'), # Redoc UI
         
     # Эндпоинты приложений
     path('api/v1.0/mainapp/', include('mainapp.urls')),
+
+    # Метрики Prometheus
+    path('metrics', metrics_view, name='metrics'),
 ]
 
+# debug_toolbar и drf-spectacular импортируются только там, где включены
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    import debug_toolbar
+
+    urlpatterns.append(path('__debug__/', include(debug_toolbar.urls)))
+
+if settings.API_DOCS_ENABLED:
+    from drf_spectacular.views import (
+        SpectacularAPIView,
+        SpectacularSwaggerView,
+        SpectacularRedocView,
+    )
+
+    urlpatterns += [
+        path('api/v1.0/schema/', SpectacularAPIView.as_view(), name='schema'), # JSON схема
+        path('api/v1.0/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'), # Swagger UI
+        path('api/v1.0/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'), # Redoc UI
+    ]
+
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
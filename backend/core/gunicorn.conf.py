@@ -0,0 +1,28 @@
+"""
+Конфигурация gunicorn: gunicorn -c gunicorn.conf.py core.wsgi
+(или -k uvicorn.workers.UvicornWorker core.asgi).
+
+Метрики Prometheus собираются со всех воркеров: PROMETHEUS_MULTIPROC_DIR
+должен быть задан в окружении до запуска (см. mainapp.metrics).
+"""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+
+
+def on_starting(server):
+    # Файлы метрик прошлого запуска не должны попасть в новые значения
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
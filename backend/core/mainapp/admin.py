@@ -1,6 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.files.storage import default_storage
+from django.db.models import Count
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Catalog, Product, ProductOption, Order, OrderItem
+from . import cache as menu_cache, orders
+from .models import Catalog, Product, ProductOption, Order, OrderItem, OutboxMessage
 
 class ProductOptionInline(admin.TabularInline):
     """
@@ -33,18 +37,24 @@ class CatalogAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(products_count=Count('products'))
+
     def products_count(self, obj):
         """
-        Отображает количество товаров в каталоге
+        Отображает количество товаров в каталоге (аннотация из get_queryset)
         """
-        return obj.products.count()
+        return obj.products_count
     products_count.short_description = 'Количество товаров'
+    products_count.admin_order_field = 'products_count'
     
     def make_actual(self, request, queryset):
         """
         Действие: пометить каталоги как актуальные
         """
-        updated = queryset.update(actual=True)
+        updated = queryset.update(actual=True, updated_at=timezone.now())
+        # update() не шлёт post_save — сбрасываем кэш меню явно
+        menu_cache.invalidate(menu_cache.CATALOGS)
         self.message_user(
             request, 
             f'{updated} каталогов помечено как актуальные'
@@ -55,7 +65,9 @@ class CatalogAdmin(admin.ModelAdmin):
         """
         Действие: пометить каталоги как неактуальные
         """
-        updated = queryset.update(actual=False)
+        updated = queryset.update(actual=False, updated_at=timezone.now())
+        # update() не шлёт post_save — сбрасываем кэш меню явно
+        menu_cache.invalidate(menu_cache.CATALOGS)
         self.message_user(
             request, 
             f'{updated} каталогов помечено как неактуальные'
@@ -71,13 +83,13 @@ class ProductAdmin(admin.ModelAdmin):
     """
     list_display = ('title', 'catalog', 'display_price', 'display_image', 'display_created_at')
     list_filter = ('catalog', 'created_at',)  # Добавил фильтр по каталогу
-    search_fields = ('title', 'description', 'catalog__name')  # Добавил поиск по названию каталога
+    search_fields = ('title', 'sku', 'description', 'catalog__name')  # Добавил поиск по названию каталога
     list_select_related = ('catalog',)  # Оптимизация запросов
     readonly_fields = ('created_at', 'display_image_preview')
     inlines = (ProductOptionInline,)
     fieldsets = (
         ('Основная информация', {
-            'fields': ('title', 'description', 'price', 'catalog', 'image')  # Добавил catalog
+            'fields': ('title', 'sku', 'description', 'price', 'catalog', 'image')  # Добавил catalog
         }),
         ('Дополнительная информация', {
             'fields': ('meta', 'created_at', 'display_image_preview'),
@@ -91,7 +103,10 @@ class ProductAdmin(admin.ModelAdmin):
 
     def display_image(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="50" height="50" style="object-fit: cover;" />', obj.image.url)
+            # Миниатюра вместо исходника, пока она построена
+            thumbnail = (obj.image_variants or {}).get('thumbnail', {}).get('jpeg')
+            url = default_storage.url(thumbnail) if thumbnail else obj.image.url
+            return format_html('<img src="{}" width="50" height="50" style="object-fit: cover;" />', url)
         return "—"
     display_image.short_description = 'Изображение'
 
@@ -120,6 +135,9 @@ class OrderItemInline(admin.TabularInline):
     fields = ('product', 'quantity', 'price', 'display_options')
     can_delete = False
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
     def display_options(self, obj):
         if obj.options:
             options_text = []
@@ -141,24 +159,25 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'telegram_user_id', 'status', 'display_total', 'created_at', 'address')
     list_filter = ('status', 'created_at')
     search_fields = ('id', 'telegram_user_id', 'address')
-    readonly_fields = ('created_at', 'display_items', 'display_created_at')
+    # Статус меняется только действиями списка: через orders.change_status
+    readonly_fields = ('status', 'paid_at', 'created_at', 'display_items', 'display_created_at')
     fieldsets = (
         ('Основная информация', {
-            'fields': ('telegram_user_id', 'status', 'total', 'address')
+            'fields': ('telegram_user_id', 'status', 'paid_at', 'total', 'address')
         }),
         ('Дополнительная информация', {
             'fields': ('extra', 'display_created_at', 'display_items'),
             'classes': ('collapse',)
         }),
     )
-    actions = ['mark_as_paid', 'mark_as_completed', 'mark_as_rejected']
+    actions = ['mark_as_paid', 'mark_as_accepted', 'mark_as_completed', 'mark_as_rejected']
 
     def display_total(self, obj):
         return f"{obj.total} ₽"
     display_total.short_description = 'Сумма'
 
     def display_items(self, obj):
-        items = obj.items.all()
+        items = obj.items.select_related('product')
         if items:
             items_text = []
             for item in items:
@@ -175,20 +194,40 @@ class OrderAdmin(admin.ModelAdmin):
         return obj.created_at.strftime('%d.%m.%Y %H:%M')
     created_at.short_description = 'Дата создания'
 
+    def _change_status(self, request, queryset, new_status, done):
+        """
+        Смена статуса через общий путь с API: один UPDATE и уведомления.
+        Заказы, для которых переход запрещён, перечисляются предупреждением.
+        """
+        results = orders.change_status(queryset.values_list('pk', flat=True), new_status)
+        updated = sum(1 for r in results.values() if r == orders.UPDATED)
+        self.message_user(request, f"{updated} заказов отмечены как {done}")
+
+        conflicts = [pk for pk, r in results.items() if r == orders.CONFLICT]
+        if conflicts:
+            self.message_user(
+                request,
+                f"{len(conflicts)} заказов не изменены: переход в статус "
+                f"«{Order.StatusType(new_status).label}» из их текущего статуса запрещён "
+                f"({', '.join(f'#{pk}' for pk in conflicts)})",
+                level=messages.WARNING,
+            )
+
     @admin.action(description="Отметить как оплаченные")
     def mark_as_paid(self, request, queryset):
-        updated = queryset.update(status=Order.StatusType.PAID)
-        self.message_user(request, f"{updated} заказов отмечены как оплаченные")
+        self._change_status(request, queryset, Order.StatusType.PAID, 'оплаченные')
+
+    @admin.action(description="Отметить как принятые")
+    def mark_as_accepted(self, request, queryset):
+        self._change_status(request, queryset, Order.StatusType.ACCEPTED, 'принятые')
 
     @admin.action(description="Отметить как завершенные")
     def mark_as_completed(self, request, queryset):
-        updated = queryset.update(status=Order.StatusType.COMPLETED)
-        self.message_user(request, f"{updated} заказов отмечены как завершенные")
+        self._change_status(request, queryset, Order.StatusType.COMPLETED, 'завершенные')
 
     @admin.action(description="Отметить как отклоненные")
     def mark_as_rejected(self, request, queryset):
-        updated = queryset.update(status=Order.StatusType.REJECTED)
-        self.message_user(request, f"{updated} заказов отмечены как отклоненные")
+        self._change_status(request, queryset, Order.StatusType.REJECTED, 'отклоненные')
 
 
 @admin.register(OrderItem)
@@ -199,6 +238,7 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('id', 'order', 'product', 'quantity', 'display_price', 'display_options')
     list_filter = ('order__status',)
     search_fields = ('order__id', 'product__title')
+    list_select_related = ('order', 'product')
     readonly_fields = ('order', 'product', 'quantity', 'price', 'options')
 
     def display_price(self, obj):
@@ -223,9 +263,30 @@ class ProductOptionAdmin(admin.ModelAdmin):
     list_display = ('product', 'name', 'display_values')
     list_filter = ('product',)
     search_fields = ('product__title', 'name')
+    list_select_related = ('product',)
 
     def display_values(self, obj):
         if obj.values:
             return ", ".join(str(v) for v in obj.values)
         return "—"
-    display_values.short_description = 'Значения'
\ No newline at end of file
+    display_values.short_description = 'Значения'
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    """
+    Админ-панель для исходящих сообщений Telegram
+    """
+    list_display = ('id', 'method', 'chat_id', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'method')
+    search_fields = ('chat_id',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    actions = ['retry_now']
+
+    @admin.action(description="Повторить отправку сейчас")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=OutboxMessage.StatusType.SENT).update(
+            status=OutboxMessage.StatusType.PENDING,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"{updated} сообщений поставлены в очередь")
@@ -0,0 +1,228 @@
+"""
+Асинхронные версии эндпоинтов меню и действий с заказами.
+
+Работают поверх async ORM Django и httpx, поэтому под ASGI-сервером
+(uvicorn core.asgi:application) ожидание базы и Telegram не занимает
+поток. Формат ответов совпадает с DRF-вьюсетами из mainapp.views,
+кэш меню общий (mainapp.cache).
+"""
+import json
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import cache as menu_cache, orders, telegram
+from .links import request_url
+from .models import Catalog, Product, Order
+from .renderers import ORJSONRenderer
+from .serializers import CatalogSerializer, ProductSerializer
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        ORJSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+    )
+
+
+def parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise Http404
+
+
+def request_data(request):
+    """
+    Тело запроса: JSON или form-data, как принимает DRF
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+async def cached_response(namespace, request, build):
+    """
+    Асинхронный аналог MenuCacheMixin.cached_response, включая 304
+    """
+    key, etag, last_modified = await sync_to_async(menu_cache.validators)(
+        namespace, request, 'json'
+    )
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return conditional
+
+    data = await cache.aget(key)
+    if data is None:
+        data = await build()
+        await cache.aset(key, data, settings.MENU_CACHE_TIMEOUT)
+    response = json_response(data)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+async def paginate(request, queryset):
+    """
+    Страница в формате PageNumberPagination: count, next, previous, results
+    """
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    count = await queryset.acount()
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        raise Http404
+    last_page = max(1, -(-count // page_size))
+    if not 1 <= page <= last_page:
+        raise Http404
+
+    offset = (page - 1) * page_size
+    objects = [obj async for obj in queryset[offset:offset + page_size]]
+
+    url = request_url(request)
+    next_link = replace_query_param(url, 'page', page + 1) if page < last_page else None
+    if page == 1:
+        previous_link = None
+    elif page == 2:
+        previous_link = remove_query_param(url, 'page')
+    else:
+        previous_link = replace_query_param(url, 'page', page - 1)
+    return count, next_link, previous_link, objects
+
+
+@require_GET
+async def catalogs_actual(request):
+    """
+    GET /api/async/catalogs/actual/ — актуальные каталоги
+    """
+    async def build():
+        catalogs = (
+            Catalog.objects
+            .annotate(products_count=Count('products'))
+            .filter(actual=True)
+            .order_by('-created_at')
+        )
+        return CatalogSerializer([c async for c in catalogs], many=True).data
+
+    return await cached_response(menu_cache.CATALOGS, request, build)
+
+
+@require_GET
+async def products_list(request):
+    """
+    GET /api/async/products/?catalog=&page= — товары с опциями
+    """
+    async def build():
+        products = Product.objects.prefetch_related('options').order_by('id')
+        if request.GET.get('catalog'):
+            products = products.filter(catalog_id=parse_id(request.GET['catalog']))
+        count, next_link, previous_link, page = await paginate(request, products)
+        context = {'request': request}
+        return {
+            'count': count,
+            'next': next_link,
+            'previous': previous_link,
+            'results': ProductSerializer(page, many=True, context=context).data,
+        }
+
+    return await cached_response(menu_cache.PRODUCTS, request, build)
+
+
+@require_GET
+async def product_detail(request, pk):
+    """
+    GET /api/async/products/{id}/
+    """
+    async def build():
+        product = (
+            await Product.objects
+            .prefetch_related('options')
+            .filter(pk=parse_id(pk))
+            .afirst()
+        )
+        if product is None:
+            raise Http404
+        return ProductSerializer(product, context={'request': request}).data
+
+    return await cached_response(menu_cache.PRODUCTS, request, build)
+
+
+@csrf_exempt
+@require_POST
+async def order_send_invoice(request, pk):
+    """
+    POST /api/async/orders/{id}/send_invoice/ — инвойс через httpx
+    """
+    try:
+        order = await Order.objects.aget(pk=parse_id(pk))
+    except Order.DoesNotExist:
+        raise Http404
+
+    try:
+        response = await telegram.acall('sendInvoice', telegram.invoice_payload(order))
+    except httpx.HTTPError as exc:
+        return json_response({'ok': False, 'resp': str(exc)}, status=502)
+
+    return json_response({
+        'ok': response.is_success,
+        'resp': response.json() if response.is_success else response.text,
+    })
+
+
+async def transition_response(pk, new_status, conflict_details=None):
+    """
+    Асинхронный аналог OrderViewSet._transition_response.
+    conflict_details(order_id) добавляет поля в ответ 409.
+    """
+    order_id = parse_id(pk)
+    result, current = await sync_to_async(orders.transition)(order_id, new_status)
+    if result == orders.NOT_FOUND:
+        raise Http404
+    if result == orders.CONFLICT:
+        data = {'error': f'Нельзя перевести заказ из статуса {current} в {new_status}',
+                'status': current}
+        if conflict_details is not None:
+            data.update(await conflict_details(order_id))
+        return json_response(data, status=409)
+    return json_response({'status': 'ok', 'result': result})
+
+
+@csrf_exempt
+@require_POST
+async def order_mark_paid(request, pk):
+    """
+    POST /api/async/orders/{id}/mark_paid/ (при 409 — ещё и paid_at)
+    """
+    async def paid_at(order_id):
+        return {'paid_at': await Order.objects.filter(pk=order_id).values_list('paid_at', flat=True).afirst()}
+
+    return await transition_response(pk, Order.StatusType.PAID, paid_at)
+
+
+@csrf_exempt
+@require_POST
+async def order_set_status(request, pk):
+    """
+    POST /api/async/orders/{id}/set_status/
+    """
+    new_status = request_data(request).get('status')
+    if not new_status:
+        return json_response({'error': 'Статус не указан'}, status=400)
+    if new_status not in Order.StatusType.values:
+        return json_response({'error': f'Неизвестный статус: {new_status}'}, status=400)
+    return await transition_response(pk, new_status)
@@ -0,0 +1,299 @@
+"""
+Нагрузочные сценарии API и генератор синтетических данных
+(manage.py benchmark).
+
+Данные и последовательность запросов определяются одним seed, поэтому
+прогоны на одной и той же базе сравнимы между собой. Запросы идут через
+django.test.Client — весь стек middleware и представлений, но без сети.
+Вызовы Telegram Bot API подменяются заглушкой (StubTelegramSession),
+кэш — отдельным LocMemCache (private_cache): настроенный кэш может быть
+общим с рабочими процессами, а сценарии его очищают.
+"""
+import math
+import re
+import time
+from decimal import Decimal
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from . import cache as menu_cache
+from . import search, telegram
+from .models import Catalog, Product, ProductOption, Order, OrderItem
+
+
+BATCH_SIZE = 2000
+
+PRIVATE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mainapp-benchmark',
+    },
+}
+
+DRINKS = ['Капучино', 'Латте', 'Раф', 'Американо', 'Эспрессо', 'Флэт уайт', 'Какао', 'Чай', 'Матча', 'Глясе']
+FLAVOURS = ['ванильный', 'карамельный', 'ореховый', 'кокосовый', 'мятный', 'имбирный', 'классический', 'сезонный']
+WORDS = ['молоко', 'сироп', 'зерно', 'арабика', 'пенка', 'корица', 'шоколад', 'лёд', 'сливки', 'мёд']
+OPTIONS = {
+    'молоко': ['Цельное', 'Овсяное', 'Миндальное', 'Кокосовое'],
+    'размер': ['S', 'M', 'L'],
+    'сироп': ['Ваниль', 'Карамель', 'Лесной орех'],
+    'сахар': ['Без сахара', '1', '2'],
+}
+# Статусы засеянных заказов и их доли
+STATUS_WEIGHTS = {
+    Order.StatusType.CREATED: 40,
+    Order.StatusType.PAID: 20,
+    Order.StatusType.ACCEPTED: 15,
+    Order.StatusType.COMPLETED: 20,
+    Order.StatusType.REJECTED: 5,
+}
+
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def batches(items, size=BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(rng, catalogs, products, orders):
+    """
+    Заполняет базу синтетическими каталогами, товарами с опциями и заказами
+    с позициями. Пишет пачками bulk_create, индекс поиска обновляет сам
+    (сигналы на bulk_create не срабатывают).
+    """
+    catalog_ids = [
+        c.pk for c in Catalog.objects.bulk_create(
+            Catalog(name=f'Каталог {i}', actual=i % 10 != 0) for i in range(1, catalogs + 1)
+        )
+    ]
+
+    prices = {}
+
+    def make_products():
+        for i in range(1, products + 1):
+            yield Product(
+                title=f'{rng.choice(DRINKS)} {rng.choice(FLAVOURS)} {i}',
+                description=' '.join(rng.choices(WORDS, k=rng.randint(5, 30))),
+                price=Decimal(rng.randint(9000, 59000)) / 100,
+                meta={'tags': rng.sample(WORDS, 2), 'kcal': rng.randint(0, 450)},
+                catalog_id=rng.choice(catalog_ids),
+            )
+
+    for batch in batches(make_products()):
+        created = Product.objects.bulk_create(batch)
+        search.index_products(created)
+        prices.update((p.pk, p.price) for p in created)
+        ProductOption.objects.bulk_create(
+            ProductOption(product_id=p.pk, name=name, values=OPTIONS[name])
+            for p in created
+            for name in rng.sample(sorted(OPTIONS), rng.randint(0, 3))
+        )
+
+    product_ids = list(prices)
+    users = max(orders // 5, 1)
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+
+    def make_orders():
+        for _ in range(orders):
+            items = [
+                OrderItem(product_id=pk, quantity=rng.randint(1, 3), price=prices[pk])
+                for pk in rng.sample(product_ids, min(rng.randint(1, 4), len(product_ids)))
+            ]
+            order = Order(
+                telegram_user_id=10 ** 9 + rng.randrange(users),
+                status=rng.choices(statuses, weights)[0],
+                total=sum(item.price * item.quantity for item in items),
+                address=f'ул. Тестовая, д. {rng.randint(1, 200)}',
+            )
+            yield order, items
+
+    for batch in batches(make_orders()):
+        created = Order.objects.bulk_create(order for order, _ in batch)
+        for order, (_, items) in zip(created, batch):
+            for item in items:
+                item.order_id = order.pk
+        OrderItem.objects.bulk_create(item for _, items in batch for item in items)
+
+    menu_cache.bump_version(menu_cache.CATALOGS, menu_cache.PRODUCTS)
+
+
+def private_cache():
+    """
+    Подменяет CACHES на время бенчмарка
+    """
+    return override_settings(CACHES=PRIVATE_CACHES)
+
+
+class StubTelegramSession:
+    """
+    Заглушка requests.Session для Bot API: отвечает {"ok": true}
+    через latency секунд
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def post(self, url, json=None, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"ok":true,"result":{}}'
+        response.headers['Content-Type'] = 'application/json'
+        return response
+
+
+class Scenarios:
+    """
+    Сценарии нагрузки. Каждый метод делает один запрос к API;
+    случайность — только через self.rng.
+    """
+    NAMES = [
+        'catalogs_actual',
+        'products_list',
+        'products_compact',
+        'product_detail',
+        'products_search',
+        'orders_by_user',
+        'order_create',
+        'order_set_status',
+        'order_send_invoice',
+    ]
+
+    def __init__(self, rng, client):
+        self.rng = rng
+        self.client = client
+        self.product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+        self.user_ids = list(
+            Order.objects.order_by('telegram_user_id').values_list('telegram_user_id', flat=True).distinct()
+        )
+        # Заказы, которые ещё можно принять: каждый сценарий set_status тратит один
+        self.created_orders = list(
+            Order.objects.filter(status=Order.StatusType.CREATED).order_by('pk').values_list('pk', flat=True)
+        )
+        rng.shuffle(self.created_orders)
+        self.order_ids = list(Order.objects.order_by('pk').values_list('pk', flat=True)[:10000])
+        self.pages = max(len(self.product_ids) // 30, 1)
+
+    def catalogs_actual(self):
+        return self.client.get(reverse('catalog-actual'))
+
+    def products_list(self):
+        return self.client.get(reverse('product-list'), {'page': self.rng.randint(1, self.pages)})
+
+    def products_compact(self):
+        return self.client.get(
+            reverse('product-list'), {'page': self.rng.randint(1, self.pages), 'view': 'compact'}
+        )
+
+    def product_detail(self):
+        return self.client.get(reverse('product-detail', args=[self.rng.choice(self.product_ids)]))
+
+    def products_search(self):
+        query = f'{self.rng.choice(DRINKS)[:4]} {self.rng.choice(WORDS)[:3]}'
+        return self.client.get(reverse('product-search'), {'q': query})
+
+    def orders_by_user(self):
+        return self.client.get(reverse('order-list'), {'telegram_user_id': self.rng.choice(self.user_ids)})
+
+    def order_create(self):
+        items = [
+            {'product': pk, 'quantity': self.rng.randint(1, 3), 'options': {'молоко': 'Овсяное'}}
+            for pk in self.rng.sample(self.product_ids, min(3, len(self.product_ids)))
+        ]
+        return self.client.post(
+            reverse('order-list'),
+            {'telegram_user_id': self.rng.choice(self.user_ids), 'address': 'ул. Тестовая', 'items': items},
+            content_type='application/json',
+        )
+
+    def order_set_status(self):
+        order_id = self.created_orders.pop() if self.created_orders else self.order_ids[0]
+        return self.client.post(
+            reverse('order-set-status', args=[order_id]),
+            {'status': Order.StatusType.ACCEPTED},
+            content_type='application/json',
+        )
+
+    def order_send_invoice(self):
+        return self.client.post(reverse('order-send-invoice', args=[self.rng.choice(self.order_ids)]))
+
+
+def percentile(sorted_values, p):
+    """
+    Перцентиль p (0–100) по ближайшему рангу
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def measure(scenario, requests_count, warmup):
+    """
+    Выполняет сценарий warmup + requests_count раз, замеряет только
+    последние requests_count
+    """
+    for _ in range(warmup):
+        scenario()
+
+    latencies = []
+    errors = 0
+    db_queries = 0
+    db_time = 0.0
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        request_started = time.perf_counter()
+        response = scenario()
+        latencies.append(time.perf_counter() - request_started)
+        if response.status_code >= 400:
+            errors += 1
+        match = SERVER_TIMING_DB.search(response.get('Server-Timing', ''))
+        if match:
+            db_time += float(match.group(1))
+            db_queries += int(match.group(2))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = [value * 1000 for value in latencies]
+    return {
+        'requests': requests_count,
+        'errors': errors,
+        'throughput_rps': round(requests_count / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else 0.0,
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p90_ms': round(percentile(ms, 90), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+        'max_ms': round(ms[-1], 3) if ms else 0.0,
+        'db_queries_per_request': round(db_queries / requests_count, 2) if requests_count else 0.0,
+        'db_ms_per_request': round(db_time / requests_count, 3) if requests_count else 0.0,
+    }
+
+
+def run(names, rng, requests_count, warmup=10, telegram_latency=0.0):
+    """
+    Прогоняет сценарии names по очереди. Возвращает {сценарий: результаты}.
+    Перед каждым сценарием кэш (свой, см. private_cache) очищается:
+    прогрев входит в warmup.
+    """
+    client = Client()
+    scenarios = Scenarios(rng, client)
+    results = {}
+    stub = StubTelegramSession(telegram_latency)
+    with private_cache(), mock.patch.object(telegram, 'get_session', return_value=stub):
+        for name in names:
+            cache.clear()
+            results[name] = measure(getattr(scenarios, name), requests_count, warmup)
+    return results
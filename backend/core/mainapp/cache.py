@@ -0,0 +1,111 @@
+"""
+Кэширование ответов меню (каталоги и товары).
+
+У каждого пространства имён есть «версия» — метка времени последнего
+изменения данных. Версия входит в ключ кэша, поэтому инвалидация сводится
+к смене версии: старые ключи просто перестают читаться и истекают сами.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils.http import quote_etag
+
+
+# Пространства имён кэша
+CATALOGS = 'catalogs'
+PRODUCTS = 'products'
+
+VERSION_KEY = 'mainapp:menu:version:{}'
+RESPONSE_KEY = 'mainapp:menu:{}:{}:{}'
+
+# Меню изменилось (версии уже сменены), аргумент namespaces
+menu_changed = Signal()
+
+# Пространства имён, ожидающие сброса после фиксации транзакции
+_pending = threading.local()
+
+
+def _new_version():
+    # Микросекунды: после потери кэша версия не совпадёт ни с одной прежней
+    return time.time_ns() // 1000
+
+
+def get_version(namespace):
+    """
+    Возвращает текущую версию пространства имён, создавая её при отсутствии
+    """
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, settings.MENU_CACHE_VERSION_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(*namespaces):
+    """
+    Немедленно меняет версии указанных пространств имён
+    """
+    version = _new_version()
+    cache.set_many(
+        {VERSION_KEY.format(ns): version for ns in namespaces}, settings.MENU_CACHE_VERSION_TIMEOUT
+    )
+    menu_changed.send(sender=None, namespaces=namespaces)
+
+
+def invalidate(*namespaces):
+    """
+    Сбрасывает кэш после фиксации текущей транзакции, чтобы конкурентный
+    запрос не успел закэшировать ещё не зафиксированные данные.
+
+    Несколько вызовов в одной транзакции (товар с опциями) дают одну смену
+    версий: первый обработчик on_commit сбрасывает всё накопленное,
+    остальные ничего не делают. Пространства имён из откаченной точки
+    сохранения сбросятся при следующей фиксации — лишний сброс безвреден.
+    """
+    if not hasattr(_pending, 'namespaces'):
+        _pending.namespaces = set()
+    _pending.namespaces.update(namespaces)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    namespaces = getattr(_pending, 'namespaces', None)
+    if namespaces:
+        _pending.namespaces = set()
+        bump_version(*sorted(namespaces))
+
+
+def make_key(namespace, request, version=None):
+    """
+    Ключ ответа: версия пространства имён + путь и отсортированные параметры
+    запроса (фильтры, номер страницы). Хоста в ключе нет: ссылки в ответах
+    строятся от PUBLIC_BASE_URL (mainapp.links).
+    """
+    if version is None:
+        version = get_version(namespace)
+    params = sorted(request.GET.lists())
+    raw = f'{request.path}?{params}'
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return RESPONSE_KEY.format(namespace, version, digest)
+
+
+def validators(namespace, request, variant=''):
+    """
+    Ключ кэша и валидаторы условного GET: (key, etag, last_modified).
+
+    Считаются только по версии и параметрам запроса, без обращения к базе
+    и сериализации. variant — формат ответа (json, api), чтобы разные
+    представления одного ресурса имели разные ETag. last_modified —
+    время версии в секундах (точность заголовка Last-Modified).
+    """
+    version = get_version(namespace)
+    key = make_key(namespace, request, version)
+    etag = quote_etag(hashlib.md5(f'{key}:{variant}'.encode()).hexdigest())
+    return key, etag, version // 1_000_000
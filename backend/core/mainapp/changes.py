@@ -0,0 +1,80 @@
+"""
+Журнал изменений меню (MenuChange) для инкрементальной синхронизации.
+
+Записи добавляются сигналами моделей (см. mainapp.signals) в той же
+транзакции, что и само изменение. Массовые операции через update() и
+bulk_create() сигналов не шлют — после них нужно вызвать record() явно.
+"""
+from datetime import timedelta
+
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import MenuChange
+
+
+UPDATED = MenuChange.ActionType.UPDATED
+DELETED = MenuChange.ActionType.DELETED
+
+
+def record(product_ids, action=UPDATED):
+    """
+    Записывает изменение товаров одним INSERT
+    """
+    MenuChange.objects.bulk_create(
+        MenuChange(product_id=product_id, action=action) for product_id in product_ids
+    )
+
+
+def current_version():
+    return MenuChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def changes_since(since, limit):
+    """
+    Изменения после версии since: не больше limit записей журнала.
+
+    Возвращает словарь:
+    - version: версия, до которой изменения учтены
+    - reset: журнал не покрывает since (почищен или версия из другой базы) —
+      клиенту нужно загрузить меню целиком
+    - has_more: после version есть ещё изменения
+    - updated: ID созданных/изменённых товаров
+    - deleted: ID удалённых товаров
+    """
+    bounds = MenuChange.objects.aggregate(first=Min('id'), last=Max('id'))
+    first, last = bounds['first'], bounds['last'] or 0
+    result = {'version': last, 'reset': False, 'has_more': False, 'updated': [], 'deleted': []}
+    if since > last or (first is not None and since < first - 1):
+        result['reset'] = True
+        return result
+
+    entries = list(
+        MenuChange.objects
+        .filter(id__gt=since)
+        .order_by('id')
+        .values_list('id', 'product_id', 'action')[:limit]
+    )
+    if not entries:
+        return result
+
+    # Для каждого товара важно только последнее действие
+    actions = {}
+    for _, product_id, action in entries:
+        actions[product_id] = action
+    result['version'] = entries[-1][0]
+    result['has_more'] = result['version'] < last
+    result['updated'] = sorted(pk for pk, action in actions.items() if action == UPDATED)
+    result['deleted'] = sorted(pk for pk, action in actions.items() if action == DELETED)
+    return result
+
+
+def prune(days):
+    """
+    Удаляет записи старше days дней. Последняя запись сохраняется всегда,
+    чтобы версия меню не откатывалась назад.
+    """
+    last = current_version()
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = MenuChange.objects.filter(created_at__lt=cutoff).exclude(id=last).delete()
+    return deleted
@@ -0,0 +1,103 @@
+"""
+Уменьшенные варианты изображений товаров (Pillow).
+
+Для каждого загруженного Product.image строятся варианты фиксированных
+размеров из PRODUCT_IMAGE_VARIANTS в форматах WebP и JPEG. Пути к файлам
+хранятся в Product.image_variants вместе с именем исходника, по которому
+видно, что варианты пора пересобрать.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+# Формат Pillow и параметры сохранения для каждого расширения
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_name(image_name, variant, ext):
+    """
+    Продукты/photo.jpeg -> Продукты/variants/photo_card.webp
+    """
+    base, _ = os.path.splitext(image_name)
+    directory, filename = os.path.split(base)
+    return os.path.join(directory, 'variants', f'{filename}_{variant}.{ext}')
+
+
+def needs_variants(product):
+    """
+    Варианты отсутствуют или построены для другого исходника
+    """
+    source = product.image.name if product.image else None
+    return (product.image_variants or {}).get('source') != source
+
+
+def _resize(image, size, crop):
+    if crop:
+        return ImageOps.fit(image, size, Image.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail(size, Image.LANCZOS)
+    return resized
+
+
+def delete_variants(variants):
+    for variant, files in (variants or {}).items():
+        if variant == 'source':
+            continue
+        for name in files.values():
+            default_storage.delete(name)
+
+
+def generate_variants(product):
+    """
+    Строит и сохраняет варианты изображения товара.
+    Возвращает новое значение для Product.image_variants.
+    """
+    delete_variants(product.image_variants)
+    if not product.image:
+        return {}
+
+    with product.image.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    variants = {'source': product.image.name}
+    for variant, (width, height, crop) in settings.PRODUCT_IMAGE_VARIANTS.items():
+        resized = _resize(image, (width, height), crop)
+        files = {}
+        for ext, (fmt, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, fmt, **options)
+            name = variant_name(product.image.name, variant, ext)
+            default_storage.delete(name)
+            files[ext] = default_storage.save(name, ContentFile(buffer.getvalue()))
+        variants[variant] = files
+    return variants
+
+
+def update_variants(product):
+    """
+    Пересобирает варианты и записывает их одним UPDATE без сигналов.
+    Ошибки чтения изображения логируются и не мешают сохранению товара.
+    """
+    try:
+        variants = generate_variants(product)
+    except (OSError, ValueError):
+        logger.exception('Не удалось построить варианты изображения товара #%s', product.pk)
+        return None
+
+    Product.objects.filter(pk=product.pk).update(image_variants=variants)
+    product.image_variants = variants
+    return variants
@@ -0,0 +1,26 @@
+"""
+Абсолютные ссылки в ответах API.
+
+Строятся от PUBLIC_BASE_URL, а не от заголовка Host: ответы меню
+кэшируются без учёта хоста, а снимок меню собирается вне запроса.
+"""
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+
+def absolute_url(url):
+    """
+    /staticmedia/a.jpg -> https://shop.example/staticmedia/a.jpg;
+    уже абсолютный URL (CDN хранилища) не меняется
+    """
+    if urlsplit(url).scheme:
+        return url
+    return settings.PUBLIC_BASE_URL.rstrip('/') + '/' + url.lstrip('/')
+
+
+def request_url(request):
+    """
+    Абсолютный URL текущего запроса (ссылки пагинации)
+    """
+    return absolute_url(request.get_full_path())
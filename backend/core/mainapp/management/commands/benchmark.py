@@ -0,0 +1,152 @@
+import json
+import platform
+import random
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from mainapp import benchmark
+from mainapp.models import Product
+
+
+COLUMNS = ['throughput_rps', 'p50_ms', 'p99_ms', 'db_queries_per_request']
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк основных эндпоинтов API на отдельной базе с синтетическими данными: "
+        "пропускная способность, p50/p99, SQL-запросов на запрос. Telegram — заглушка."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--catalogs', type=int, default=50)
+        parser.add_argument('--products', type=int, default=20000)
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--requests', type=int, default=300, help="Запросов на сценарий")
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument(
+            '--scenario', action='append', choices=benchmark.Scenarios.NAMES,
+            help="Только эти сценарии (можно несколько раз)",
+        )
+        parser.add_argument(
+            '--telegram-latency', type=float, default=0.0,
+            help="Задержка заглушки Bot API, мс",
+        )
+        parser.add_argument(
+            '--database', default=str(settings.BASE_DIR / 'benchmark.sqlite3'),
+            help="Файл базы бенчмарка (SQLite); рабочая база не трогается",
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help="Не удалять базу после прогона и не засеивать заново, если данные уже есть",
+        )
+        parser.add_argument('--output', help="Записать результаты в JSON-файл")
+        parser.add_argument('--compare', help="Сравнить с результатами из JSON-файла")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Не удалось прочитать {options['compare']}: {exc}")
+
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = options['database']
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment(debug=False)
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb']
+        )
+        try:
+            # seed тоже пишет в кэш (версии меню)
+            with benchmark.private_cache():
+                result = self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.report(result['scenarios'], baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты записаны в {options['output']}")
+
+    def benchmark(self, options):
+        dataset = {key: options[key] for key in ('seed', 'catalogs', 'products', 'orders')}
+        seed_seconds = None
+        if not Product.objects.exists():
+            self.stdout.write('Засеиваю базу...')
+            started = time.perf_counter()
+            benchmark.seed(
+                random.Random(options['seed']),
+                options['catalogs'], options['products'], options['orders'],
+            )
+            seed_seconds = round(time.perf_counter() - started, 2)
+            self.stdout.write(f'Засеяно за {seed_seconds} с')
+
+        scenarios = benchmark.run(
+            options['scenario'] or benchmark.Scenarios.NAMES,
+            random.Random(options['seed']),
+            options['requests'],
+            warmup=options['warmup'],
+            telegram_latency=options['telegram_latency'] / 1000,
+        )
+        return {
+            'meta': {
+                'time': timezone.now().isoformat(),
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'django_env': 'production' if settings.PRODUCTION else 'development',
+                'dataset': dataset,
+                'seed_seconds': seed_seconds,
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'telegram_latency_ms': options['telegram_latency'],
+            },
+            'scenarios': scenarios,
+        }
+
+    def report(self, scenarios, baseline):
+        before = baseline['scenarios'] if baseline else {}
+        self.stdout.write(
+            f'{"":<20}{"запросов/с":>12}{"p50, мс":>10}{"p99, мс":>10}{"SQL/запрос":>12}{"ошибок":>8}'
+        )
+        for name, row in scenarios.items():
+            self.stdout.write(
+                f'{name:<20}{row["throughput_rps"]:>12.1f}{row["p50_ms"]:>10.2f}'
+                f'{row["p99_ms"]:>10.2f}{row["db_queries_per_request"]:>12.1f}{row["errors"]:>8}'
+            )
+            old = before.get(name)
+            if old:
+                changes = ''.join(
+                    f'{self.change(old[column], row[column]):>{width}}'
+                    for column, width in zip(COLUMNS, (12, 10, 10, 12))
+                )
+                self.stdout.write(f'{"  было → стало":<20}{changes}')
+
+    @staticmethod
+    def change(old, new):
+        if not old:
+            return '—'
+        return f'{(new - old) / old * 100:+.0f}%'
@@ -0,0 +1,99 @@
+import io
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from mainapp.models import Product, ProductOption, Order, OrderItem
+from mainapp.parsers import ORJSONParser
+from mainapp.renderers import ORJSONRenderer
+from mainapp.serializers import ProductSerializer, OrderSerializer
+
+
+def make_products(count):
+    """
+    Несохранённые товары с опциями в кэше prefetch — сериализуются без базы
+    """
+    now = timezone.now()
+    products = []
+    for i in range(1, count + 1):
+        product = Product(
+            pk=i,
+            title=f'Товар {i}',
+            description='Описание товара ' * 10,
+            price=Decimal(f'{100 + i % 900}.{i % 100:02d}'),
+            meta={'tags': ['кофе', 'горячее'], 'kcal': 120.5, 'volume': [250, 350, 450]},
+            catalog_id=i % 10 + 1,
+            created_at=now,
+            updated_at=now,
+        )
+        product._prefetched_objects_cache = {'options': [
+            ProductOption(pk=i * 2, product=product, name='молоко', values=['Цельное', 'Овсяное']),
+            ProductOption(pk=i * 2 + 1, product=product, name='размер', values=['S', 'M', 'L']),
+        ]}
+        products.append(product)
+    return products
+
+
+def make_orders(count):
+    orders = []
+    for i in range(1, count + 1):
+        order = Order(
+            pk=i,
+            telegram_user_id=10 ** 9 + i,
+            total=Decimal(f'{i % 5000}.50'),
+            address='ул. Ленина, д. 1',
+        )
+        order._prefetched_objects_cache = {'items': [
+            OrderItem(product_id=j, quantity=j, price=Decimal('149.90'), options={'milk': 'oat'})
+            for j in range(1, 4)
+        ]}
+        orders.append(order)
+    return orders
+
+
+def best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = "Сравнивает JSONRenderer/JSONParser DRF с orjson на списках товаров и заказов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        datasets = [
+            ('products', ProductSerializer(make_products(options['products']), many=True).data),
+            ('orders', OrderSerializer(make_orders(options['orders']), many=True).data),
+        ]
+        repeat = options['repeat']
+
+        self.stdout.write(f'{"":<20}{"размер, КБ":>12}{"DRF, мс":>10}{"orjson, мс":>12}{"ускорение":>11}')
+        for name, data in datasets:
+            expected = JSONRenderer().render(data)
+            if ORJSONRenderer().render(data) != expected:
+                raise CommandError(f'{name}: вывод orjson отличается от JSONRenderer')
+
+            rows = [
+                ('render', lambda: JSONRenderer().render(data), lambda: ORJSONRenderer().render(data)),
+                ('parse', lambda: JSONParser().parse(io.BytesIO(expected)),
+                 lambda: ORJSONParser().parse(io.BytesIO(expected))),
+            ]
+            for operation, baseline, candidate in rows:
+                before = best_time(baseline, repeat) * 1000
+                after = best_time(candidate, repeat) * 1000
+                self.stdout.write(
+                    f'{name + " " + operation:<20}{len(expected) / 1024:>12.1f}'
+                    f'{before:>10.2f}{after:>12.2f}{before / after:>10.1f}x'
+                )
@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp import menu_io
+
+
+class Command(BaseCommand):
+    help = "Выгрузка меню в CSV или JSONL в формате import_menu (см. mainapp.menu_io)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Файл или - для stdout")
+        parser.add_argument('--format', choices=sorted(menu_io.WRITERS))
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        rows = menu_io.export_rows(chunk_size=options['chunk_size'])
+        if path == '-':
+            menu_io.WRITERS[fmt](rows, sys.stdout)
+            return
+        try:
+            with open(path, 'w', newline='', encoding='utf-8') as stream:
+                count = menu_io.WRITERS[fmt](rows, stream)
+        except OSError as exc:
+            raise CommandError(f'Не удалось записать {path}: {exc}')
+        self.stderr.write(f'Выгружено товаров: {count}')
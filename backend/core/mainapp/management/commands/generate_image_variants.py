@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from mainapp import cache as menu_cache, images
+from mainapp.models import Product
+
+
+class Command(BaseCommand):
+    help = "Строит уменьшенные варианты (WebP/JPEG) для изображений товаров"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересобрать варианты даже если они уже есть',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+        built = failed = 0
+        for product in products.iterator(chunk_size=200):
+            if not options['force'] and not images.needs_variants(product):
+                continue
+            if images.update_variants(product) is None:
+                failed += 1
+                self.stderr.write(f'Товар #{product.pk}: не удалось обработать {product.image.name}')
+            else:
+                built += 1
+
+        if built:
+            menu_cache.bump_version(menu_cache.PRODUCTS)
+        self.stdout.write(self.style.SUCCESS(f'Готово: {built}, с ошибками: {failed}'))
@@ -0,0 +1,68 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mainapp import menu_io
+
+
+def detect_format(path):
+    for name in menu_io.READERS:
+        if path.endswith(f'.{name}'):
+            return name
+    raise CommandError('Не удалось определить формат по расширению, укажите --format')
+
+
+class Command(BaseCommand):
+    help = (
+        "Импорт меню из CSV или JSONL (см. mainapp.menu_io): создаёт и обновляет "
+        "каталоги, товары и опции пачками. --dry-run показывает изменения без записи."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл или - для stdin")
+        parser.add_argument('--format', choices=sorted(menu_io.READERS))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Вывести изменения и откатить их")
+        parser.add_argument('--max-errors', type=int, default=20, help="Сколько ошибок строк вывести")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path == '-' else detect_format(path))
+        verbose = options['dry_run'] or options['verbosity'] > 1
+        importer = menu_io.MenuImporter(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            on_diff=self.stdout.write if verbose else None,
+            max_errors=options['max_errors'],
+        )
+
+        started = time.perf_counter()
+        if path == '-':
+            stats = importer.run(menu_io.READERS[fmt](sys.stdin))
+        else:
+            try:
+                # utf-8-sig: CSV из Excel начинается с BOM
+                stream = open(path, newline='', encoding='utf-8-sig')
+            except OSError as exc:
+                raise CommandError(f'Не удалось открыть {path}: {exc}')
+            with stream:
+                stats = importer.run(menu_io.READERS[fmt](stream))
+        elapsed = time.perf_counter() - started
+
+        for line_num, message in importer.errors:
+            self.stderr.write(f'строка {line_num}: {message}')
+        if importer.error_count > len(importer.errors):
+            self.stderr.write(f"... и ещё {importer.error_count - len(importer.errors)}")
+
+        summary = (
+            f"товаров: создано {stats['created']}, изменено {stats['updated']}, "
+            f"без изменений {stats['unchanged']}; опций: +{stats['options_created']} "
+            f"~{stats['options_updated']} -{stats['options_deleted']}; "
+            f"новых каталогов {stats['catalogs_created']}; ошибок {importer.error_count}; "
+            f"{elapsed:.1f} с"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Пробный прогон, ничего не записано. {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
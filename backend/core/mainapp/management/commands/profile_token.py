@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mainapp import profiling
+
+
+class Command(BaseCommand):
+    help = "Выдаёт подписанный токен для заголовка X-Profile (профилирование запроса)"
+
+    def handle(self, *args, **options):
+        self.stdout.write(profiling.make_token())
+        self.stderr.write(
+            f'Действует {settings.PROFILER_TOKEN_MAX_AGE // 60} мин. '
+            f'Файлы профилей: {settings.PROFILER_DIR}'
+        )
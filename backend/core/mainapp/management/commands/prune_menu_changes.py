@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mainapp import changes
+
+
+class Command(BaseCommand):
+    help = "Удаляет старые записи журнала изменений меню"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.MENU_CHANGES_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        deleted = changes.prune(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей журнала: {deleted}'))
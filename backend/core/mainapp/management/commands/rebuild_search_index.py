@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mainapp import search
+
+
+class Command(BaseCommand):
+    help = "Перестраивает полнотекстовый индекс товаров (FTS5)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            self.stdout.write('Полнотекстовый индекс доступен только на SQLite')
+            return
+        with transaction.atomic():
+            count = search.rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано товаров: {count}'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mainapp.telegram import OutboxSender
+
+
+class Command(BaseCommand):
+    help = "Отправляет сообщения из outbox в Telegram с учётом лимитов Bot API"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Отправить одну пачку и выйти',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Пауза между опросами пустой очереди, сек.',
+        )
+
+    def handle(self, *args, **options):
+        sender = OutboxSender()
+        if options['once']:
+            sent = sender.run_once()
+            self.stdout.write(f'Обработано сообщений: {sent}')
+            return
+
+        self.stdout.write('Воркер outbox запущен')
+        try:
+            while True:
+                if not sender.run_once():
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Воркер outbox остановлен')
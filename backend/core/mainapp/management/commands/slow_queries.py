@@ -0,0 +1,73 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+SORT_KEYS = {
+    'total': lambda s: s['total_ms'],
+    'max': lambda s: s['max_ms'],
+    'count': lambda s: s['count'],
+    'avg': lambda s: s['total_ms'] / s['count'],
+}
+
+
+def load(path):
+    """
+    Записи журнала, сгруппированные по отпечатку SQL
+    """
+    groups = defaultdict(lambda: {
+        'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': defaultdict(int),
+        'sql': '', 'plan': None,
+    })
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            group = groups[entry['fingerprint']]
+            group['count'] += 1
+            group['total_ms'] += entry['duration_ms']
+            group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+            group['views'][entry.get('view') or '-'] += 1
+            group['sql'] = entry['sql']
+            if entry.get('plan'):
+                group['plan'] = entry['plan']
+    return groups
+
+
+class Command(BaseCommand):
+    help = "Сводка журнала медленных SQL-запросов: самые дорогие отпечатки и их планы"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG)
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total')
+
+    def handle(self, *args, **options):
+        try:
+            groups = load(options['log'])
+        except FileNotFoundError:
+            raise CommandError(f"Журнал {options['log']} не найден")
+        if not groups:
+            self.stdout.write('Медленных запросов нет')
+            return
+
+        ranked = sorted(groups.items(), key=lambda item: SORT_KEYS[options['sort']](item[1]), reverse=True)
+        for digest, group in ranked[:options['top']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{digest}: {group['count']} раз, всего {group['total_ms']:.0f} мс, "
+                f"в среднем {group['total_ms'] / group['count']:.1f} мс, максимум {group['max_ms']:.1f} мс"
+            ))
+            views = ', '.join(
+                f'{view} ({count})'
+                for view, count in sorted(group['views'].items(), key=lambda v: -v[1])
+            )
+            self.stdout.write(f'  маршруты: {views}')
+            self.stdout.write(f"  {group['sql'][:500]}")
+            for row in group['plan'] or []:
+                # Полный проход таблицы без индекса — первый кандидат на индекс
+                style = self.style.WARNING if 'SCAN' in row and 'INDEX' not in row else str
+                self.stdout.write(style(f'  plan: {row}'))
@@ -0,0 +1,142 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+SCHEMA = """
+CREATE TABLE product (id INTEGER PRIMARY KEY, title TEXT, price NUMERIC);
+CREATE TABLE product_option (id INTEGER PRIMARY KEY, product_id INTEGER, name TEXT, "values" TEXT);
+CREATE TABLE orders (id INTEGER PRIMARY KEY, telegram_user_id INTEGER, total NUMERIC, created_at REAL);
+CREATE TABLE order_item (id INTEGER PRIMARY KEY, order_id INTEGER, product_id INTEGER, quantity INTEGER, price NUMERIC);
+CREATE INDEX order_item_order ON order_item (order_id);
+"""
+
+READ_QUERY = """
+SELECT p.id, p.title, p.price, o.name, o."values"
+FROM product p LEFT JOIN product_option o ON o.product_id = p.id
+WHERE p.id > ? ORDER BY p.id LIMIT 30
+"""
+
+
+def connect(path, tuned):
+    """
+    Соединение как у Django: по умолчанию (rollback journal, DEFERRED,
+    timeout 5 с) или с настройками из DATABASES['default']['OPTIONS'].
+    Возвращает соединение и команду начала транзакции.
+    """
+    options = settings.DATABASES['default'].get('OPTIONS', {}) if tuned else {}
+    conn = sqlite3.connect(
+        path, timeout=options.get('timeout', 5), isolation_level=None, check_same_thread=False
+    )
+    for command in options.get('init_command', '').split(';'):
+        if command.strip():
+            conn.execute(command)
+    return conn, f"BEGIN {options.get('transaction_mode') or 'DEFERRED'}"
+
+
+class Worker(threading.Thread):
+
+    def __init__(self, path, tuned, deadline, write):
+        super().__init__(daemon=True)
+        self.conn, self.begin = connect(path, tuned)
+        self.deadline = deadline
+        self.write = write
+        self.done = 0
+        self.locked = 0
+
+    def create_order(self, n):
+        # Как OrderSerializer.create: чтение цен, затем вставка в той же транзакции
+        product_ids = [n % 500 + 1, n % 300 + 1, n % 100 + 1]
+        self.conn.execute(self.begin)
+        try:
+            prices = dict(self.conn.execute(
+                'SELECT id, price FROM product WHERE id IN (?, ?, ?)', product_ids
+            ).fetchall())
+            total = sum(prices.values())
+            order_id = self.conn.execute(
+                'INSERT INTO orders (telegram_user_id, total, created_at) VALUES (?, ?, ?)',
+                (n, total, time.time()),
+            ).lastrowid
+            self.conn.executemany(
+                'INSERT INTO order_item (order_id, product_id, quantity, price) VALUES (?, ?, 1, ?)',
+                [(order_id, pk, prices[pk]) for pk in product_ids],
+            )
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def read_menu(self, n):
+        self.conn.execute(READ_QUERY, (n % 470,)).fetchall()
+
+    def run(self):
+        n = 0
+        operation = self.create_order if self.write else self.read_menu
+        while time.perf_counter() < self.deadline:
+            n += 1
+            try:
+                operation(n)
+            except sqlite3.OperationalError as exc:
+                if 'locked' not in str(exc):
+                    raise
+                self.locked += 1
+            else:
+                self.done += 1
+        self.conn.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест SQLite: параллельное создание заказов и чтение меню "
+        "на временной базе — без настроек и с настройками из DATABASES['default']['OPTIONS']"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+
+    def stress(self, tuned, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stress.sqlite3')
+            setup, _ = connect(path, tuned)
+            setup.executescript(SCHEMA)
+            setup.executemany(
+                'INSERT INTO product (id, title, price) VALUES (?, ?, ?)',
+                [(i, f'Товар {i}', 100 + i % 50) for i in range(1, 501)],
+            )
+            setup.executemany(
+                'INSERT INTO product_option (product_id, name, "values") VALUES (?, ?, ?)',
+                [(i, 'молоко', '["Цельное", "Овсяное"]') for i in range(1, 501)],
+            )
+            setup.close()
+
+            deadline = time.perf_counter() + options['seconds']
+            writers = [Worker(path, tuned, deadline, True) for _ in range(options['writers'])]
+            readers = [Worker(path, tuned, deadline, False) for _ in range(options['readers'])]
+            for worker in writers + readers:
+                worker.start()
+            for worker in writers + readers:
+                worker.join()
+
+        seconds = options['seconds']
+        label = 'с настройками' if tuned else 'по умолчанию'
+        self.stdout.write(
+            f'{label:<16}'
+            f'{sum(w.done for w in writers) / seconds:>14.0f}'
+            f'{sum(w.locked for w in writers):>12}'
+            f'{sum(w.done for w in readers) / seconds:>14.0f}'
+            f'{sum(w.locked for w in readers):>12}'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"":<16}{"заказов/с":>14}{"locked":>12}{"чтений/с":>14}{"locked":>12}'
+        )
+        self.stress(False, options)
+        self.stress(True, options)
@@ -0,0 +1,391 @@
+"""
+Массовый импорт и экспорт меню (manage.py import_menu / export_menu).
+
+Формат — CSV или JSONL, одна строка на товар:
+id, sku, title, description, price, catalog, meta, options.
+catalog — название каталога (отсутствующий создаётся), meta и options
+в CSV — JSON в ячейке, options — {"название опции": [значения]}.
+
+Товар ищется по sku (артикул кассовой системы), без sku — по id.
+Колонки description, meta, catalog и options необязательны: если их нет
+в файле, у существующих товаров эти поля не меняются.
+
+Импорт потоковый: строки читаются и пишутся пачками (bulk_create и
+UPDATE через executemany), каждая пачка в своей транзакции, память не
+растёт с размером файла. Сигналы при массовых операциях не срабатывают,
+поэтому индекс поиска, журнал изменений и кэш меню обновляются здесь явно.
+"""
+import csv
+import json
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Prefetch
+
+from . import cache as menu_cache, changes, search
+from .models import Catalog, Product, ProductOption
+
+
+COLUMNS = ['id', 'sku', 'title', 'description', 'price', 'catalog', 'meta', 'options']
+JSON_COLUMNS = ('meta', 'options')
+
+
+# Чтение и запись
+
+def read_csv(stream):
+    """
+    (номер строки, словарь) для каждой строки CSV. Колонки meta и options
+    разбираются как JSON; отсутствующая колонка не попадает в словарь.
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        row = {key: value for key, value in row.items() if key is not None}
+        for key in JSON_COLUMNS:
+            if key in row:
+                try:
+                    row[key] = json.loads(row[key]) if row[key] else {}
+                except ValueError:
+                    row[key] = ValueError(f'{key}: некорректный JSON')
+        yield reader.line_num, row
+
+
+def read_jsonl(stream):
+    for line_num, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = ValueError('некорректный JSON')
+        yield line_num, row
+
+
+def export_rows(chunk_size=2000):
+    """
+    Товары с каталогом и опциями, по chunk_size из базы за раз
+    """
+    products = (
+        Product.objects
+        .select_related('catalog')
+        .prefetch_related(Prefetch('options', queryset=ProductOption.objects.order_by('pk')))
+        .order_by('pk')
+    )
+    for product in products.iterator(chunk_size=chunk_size):
+        yield {
+            'id': product.pk,
+            'sku': product.sku or '',
+            'title': product.title,
+            'description': product.description,
+            'price': str(product.price),
+            'catalog': product.catalog.name if product.catalog else '',
+            'meta': product.meta,
+            'options': {option.name: option.values for option in product.options.all()},
+        }
+
+
+def write_csv(rows, stream):
+    writer = csv.DictWriter(stream, fieldnames=COLUMNS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        for key in JSON_COLUMNS:
+            row[key] = json.dumps(row[key], ensure_ascii=False)
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(rows, stream):
+    count = 0
+    for row in rows:
+        stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+
+# Разбор строк
+
+def clean_row(row):
+    """
+    Проверенные значения строки: id, sku, fields — поля Product из файла
+    (валидаторы модели), catalog — название или None, options — словарь.
+    catalog и options есть, только если есть такие колонки.
+    Бросает ValidationError.
+    """
+    if isinstance(row, Exception):
+        raise ValidationError(str(row))
+    if not isinstance(row, dict):
+        raise ValidationError('строка должна быть объектом')
+    for key in JSON_COLUMNS:
+        if isinstance(row.get(key), Exception):
+            raise ValidationError(str(row[key]))
+
+    pk = row.get('id')
+    item = {'id': int(pk) if pk not in (None, '') else None, 'fields': {}}
+    values = {
+        'sku': str(row.get('sku') or '').strip() or None,
+        'title': str(row.get('title') or '').strip(),
+        'price': str(row.get('price') or '').replace(',', '.'),
+    }
+    # Колонки, которых нет в файле, у существующих товаров не меняются
+    if 'description' in row:
+        values['description'] = str(row['description'] or '')
+    for name, value in values.items():
+        try:
+            item['fields'][name] = Product._meta.get_field(name).clean(value, None)
+        except ValidationError as exc:
+            raise ValidationError(f"{name}: {' '.join(exc.messages)}")
+    item['sku'] = item['fields'].pop('sku')
+
+    if 'meta' in row:
+        if not isinstance(row['meta'], dict):
+            raise ValidationError('meta: нужен объект')
+        item['fields']['meta'] = row['meta']
+    if 'catalog' in row:
+        item['catalog'] = str(row['catalog'] or '').strip() or None
+
+    if 'options' in row:
+        options = row['options']
+        if not isinstance(options, dict) or not all(isinstance(v, list) for v in options.values()):
+            raise ValidationError('options: нужен объект {"опция": [значения]}')
+        for name in options:
+            ProductOption._meta.get_field('name').clean(name, None)
+        item['options'] = options
+    return item
+
+
+# Импорт
+
+def update_rows(model, objects, fields):
+    """
+    UPDATE объектов по первичному ключу одним executemany.
+    bulk_update строит CASE WHEN на каждый объект и поле: на тысячах
+    строк это секунды в ORM и квадратичный по размеру пачки SQL.
+
+    Поля auto_now (updated_at) обновляются всегда и так же, как при
+    save(): через Field.pre_save. Сигналов нет — индекс поиска, журнал
+    изменений и кэш меню обновляет вызывающий (см. MenuImporter).
+    """
+    if not objects:
+        return
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in fields]
+    fields += [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) and field not in fields
+    ]
+    for obj in objects:
+        for field in fields:
+            if getattr(field, 'auto_now', False):
+                field.pre_save(obj, add=False)
+    pk = model._meta.pk
+    sql = (
+        f'UPDATE {qn(model._meta.db_table)} SET '
+        + ', '.join(f'{qn(field.column)} = %s' for field in fields)
+        + f' WHERE {qn(pk.column)} = %s'
+    )
+    params = [
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields]
+        + [pk.get_db_prep_save(obj.pk, connection)]
+        for obj in objects
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def delete_rows(model, pks):
+    """
+    DELETE по первичному ключу без сбора объектов и сигналов post_delete
+    (QuerySet.delete() загружает и удаляет объекты по одному сигналу)
+    """
+    if not pks:
+        return
+    qn = connection.ops.quote_name
+    sql = f'DELETE FROM {qn(model._meta.db_table)} WHERE {qn(model._meta.pk.column)} = %s'
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(pk,) for pk in pks])
+
+
+class MenuImporter:
+    """
+    Upsert каталогов, товаров и опций пачками по batch_size строк.
+
+    dry_run — всё выполняется, но каждая транзакция откатывается;
+    on_diff(line) получает описание каждого изменения. Хранятся только
+    первые max_errors ошибок строк, остальные лишь считаются
+    (error_count): файл из одних ошибок не должен занять всю память.
+    """
+
+    def __init__(self, batch_size=1000, dry_run=False, on_diff=None, max_errors=100):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.on_diff = on_diff or (lambda line: None)
+        self.max_errors = max_errors
+        self.stats = Counter()
+        self.errors = []  # (номер строки, сообщение), не больше max_errors
+        self.error_count = 0
+        self.catalogs = {}  # название -> id
+        self.new_catalogs = set()
+
+    def run(self, rows):
+        batch = []
+        for line_num, row in rows:
+            try:
+                batch.append((line_num, clean_row(row)))
+            except (ValidationError, ValueError) as exc:
+                messages = exc.messages if isinstance(exc, ValidationError) else [str(exc)]
+                self.add_error(line_num, '; '.join(messages))
+                continue
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        return self.stats
+
+    def add_error(self, line_num, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line_num, message))
+
+    def import_batch(self, batch):
+        with transaction.atomic():
+            catalog_ids = self.catalog_ids({item['catalog'] for _, item in batch if item.get('catalog')})
+            products = self.upsert_products(batch, catalog_ids)
+            option_changed = self.upsert_options(products)
+
+            changed = [p for p, state, _ in products if state != 'unchanged']
+            changed_ids = {p.pk for p in changed} | option_changed
+            if changed:
+                search.index_products(changed)
+            if changed_ids:
+                changes.record(sorted(changed_ids))
+                menu_cache.invalidate(menu_cache.PRODUCTS, menu_cache.CATALOGS)
+            if self.dry_run:
+                transaction.set_rollback(True)
+        if self.dry_run:
+            # Созданные каталоги откатились вместе с транзакцией
+            self.catalogs = {n: pk for n, pk in self.catalogs.items() if n not in self.new_catalogs}
+
+    def catalog_ids(self, names):
+        missing = names - self.catalogs.keys()
+        if missing:
+            # Из одноимённых каталогов берётся первый созданный
+            for pk, name in Catalog.objects.filter(name__in=missing).order_by('-pk').values_list('pk', 'name'):
+                self.catalogs[name] = pk
+            new = sorted(missing - self.catalogs.keys())
+            for catalog in Catalog.objects.bulk_create(Catalog(name=name) for name in new):
+                self.catalogs[catalog.name] = catalog.pk
+                if catalog.name not in self.new_catalogs:
+                    self.stats['catalogs_created'] += 1
+                    self.new_catalogs.add(catalog.name)
+                    self.on_diff(f'+ каталог {catalog.name}')
+            if new:
+                menu_cache.invalidate(menu_cache.CATALOGS)
+        return self.catalogs
+
+    def upsert_products(self, batch, catalog_ids):
+        """
+        Создаёт и обновляет товары пачки. Возвращает список
+        (товар, created/updated/unchanged, опции из строки или None)
+        """
+        # Повтор товара в пачке: действует последняя строка
+        rows = {}
+        for line_num, item in batch:
+            key = ('sku', item['sku']) if item['sku'] else ('id', item['id']) if item['id'] else line_num
+            if key in rows:
+                self.stats['duplicates'] += 1
+            rows[key] = (line_num, item)
+
+        by_sku = Product.objects.in_bulk(
+            [item['sku'] for _, item in rows.values() if item['sku']], field_name='sku'
+        )
+        by_id = Product.objects.in_bulk([item['id'] for _, item in rows.values() if item['id']])
+
+        result = []
+        to_create, to_update, update_fields = [], [], set()
+        for line_num, item in rows.values():
+            product = by_sku.get(item['sku']) if item['sku'] else None
+            if product is None and item['id']:
+                product = by_id.get(item['id'])
+                if product is None and not item['sku']:
+                    self.add_error(line_num, f"товар #{item['id']} не найден")
+                    continue
+
+            values = dict(item['fields'])
+            if item['sku']:
+                values['sku'] = item['sku']
+            if 'catalog' in item:
+                values['catalog_id'] = catalog_ids[item['catalog']] if item['catalog'] else None
+            if product is None:
+                product = Product(**values)
+                to_create.append(product)
+                self.on_diff(f"+ {item['sku'] or '-'}: {values['title']}, {values['price']}")
+                state = 'created'
+            else:
+                diff = [name for name, value in values.items() if getattr(product, name) != value]
+                if diff:
+                    self.on_diff(f"~ {product.sku or '#' + str(product.pk)}: " + '; '.join(
+                        f'{name} {getattr(product, name)} → {values[name]}' for name in diff
+                    ))
+                    for name in diff:
+                        setattr(product, name, values[name])
+                    update_fields.update(diff)
+                    to_update.append(product)
+                state = 'updated' if diff else 'unchanged'
+            result.append((product, state, item.get('options')))
+
+        Product.objects.bulk_create(to_create)
+        update_rows(Product, to_update, sorted(update_fields))
+        self.stats.update(state for _, state, _ in result)
+        return result
+
+    def upsert_options(self, products):
+        """
+        Приводит опции к списку из файла (только для строк с колонкой
+        options). Возвращает id товаров, у которых изменились опции.
+        """
+        wanted = {
+            product.pk: (product, options)
+            for product, state, options in products
+            if options is not None
+        }
+        existing = {}
+        for option in ProductOption.objects.filter(product_id__in=wanted).order_by('pk'):
+            existing.setdefault(option.product_id, {}).setdefault(option.name, option)
+
+        to_create, to_update, to_delete = [], [], []
+        changed = set()
+        for product_id, (product, options) in wanted.items():
+            current = existing.get(product_id, {})
+            label = product.sku or f'#{product_id}'
+            for name, values in options.items():
+                option = current.get(name)
+                if option is None:
+                    to_create.append(ProductOption(product_id=product_id, name=name, values=values))
+                    self.on_diff(f'+ {label} опция {name}: {values}')
+                elif option.values != values:
+                    self.on_diff(f'~ {label} опция {name}: {option.values} → {values}')
+                    option.values = values
+                    to_update.append(option)
+                else:
+                    continue
+                changed.add(product_id)
+            for name, option in current.items():
+                if name not in options:
+                    to_delete.append(option.pk)
+                    self.on_diff(f'- {label} опция {name}')
+                    changed.add(product_id)
+
+        ProductOption.objects.bulk_create(to_create)
+        update_rows(ProductOption, to_update, ['values'])
+        delete_rows(ProductOption, to_delete)
+        self.stats['options_created'] += len(to_create)
+        self.stats['options_updated'] += len(to_update)
+        self.stats['options_deleted'] += len(to_delete)
+        return changed
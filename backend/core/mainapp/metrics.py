@@ -0,0 +1,149 @@
+"""
+Метрики Prometheus: задержка запросов по маршрутам, запросы к базе,
+вызовы Telegram Bot API.
+
+Несколько процессов (gunicorn, воркер outbox): задайте переменную
+окружения PROMETHEUS_MULTIPROC_DIR — пустой каталог, общий для всех
+процессов сервера, — до их запуска. Тогда /metrics собирает значения
+всех процессов (см. gunicorn.conf.py).
+"""
+import contextvars
+import os
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Время обработки HTTP-запроса',
+    ['method', 'route', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'Количество SQL-запросов на HTTP-запрос',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_duration_seconds',
+    'Суммарное время SQL-запросов на HTTP-запрос',
+    ['route'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+TELEGRAM_LATENCY = Histogram(
+    'telegram_api_duration_seconds',
+    'Время вызова Telegram Bot API',
+    ['method'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+TELEGRAM_ERRORS = Counter(
+    'telegram_api_errors_total',
+    'Ошибки вызовов Telegram Bot API (HTTP-код или network)',
+    ['method', 'reason'],
+)
+
+
+@dataclass
+class RequestStats:
+    request: object
+    started: float
+    db_queries: int = 0
+    db_time: float = 0.0
+    telegram_time: float = 0.0
+
+
+# Статистика текущего запроса; contextvar переходит и в потоки sync_to_async
+current_stats = contextvars.ContextVar('mainapp_request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    execute_wrapper для всех соединений с базой (см. mainapp.signals)
+    """
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def observe_telegram(method, started, status):
+    """
+    Учитывает вызов Bot API. status — HTTP-код ответа или 'network'
+    """
+    elapsed = time.perf_counter() - started
+    TELEGRAM_LATENCY.labels(method).observe(elapsed)
+    if status == 'network' or status >= 400:
+        TELEGRAM_ERRORS.labels(method, str(status)).inc()
+    stats = current_stats.get()
+    if stats is not None:
+        stats.telegram_time += elapsed
+
+
+def route_name(request):
+    """
+    Имя маршрута вместо пути: число меток не растёт с числом объектов
+    """
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unmatched>'
+
+
+def start_request(request):
+    stats = RequestStats(request=request, started=time.perf_counter())
+    return stats, current_stats.set(stats)
+
+
+def finish_request(request, response, stats):
+    elapsed = time.perf_counter() - stats.started
+    route = route_name(request)
+    REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(elapsed)
+    REQUEST_DB_QUERIES.labels(route).observe(stats.db_queries)
+    REQUEST_DB_TIME.labels(route).observe(stats.db_time)
+
+    timings = [
+        f'app;dur={elapsed * 1000:.1f}',
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.db_queries} queries"',
+    ]
+    if stats.telegram_time:
+        timings.append(f'telegram;dur={stats.telegram_time * 1000:.1f}')
+    response['Server-Timing'] = ', '.join(timings)
+    return response
+
+
+def metrics_view(request):
+    """
+    GET /metrics — метрики в текстовом формате Prometheus.
+    Нужен заголовок Authorization: Bearer <METRICS_TOKEN>; если токен
+    не задан, метрики отдаются только при DEBUG.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not constant_time_compare(request.headers.get('Authorization', ''), expected):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,231 @@
+"""
+Middleware приложения: метрики запросов, профилирование и сжатие ответов.
+"""
+import gzip
+import hashlib
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.middleware.gzip import GZipMiddleware
+from django.utils.deprecation import MiddlewareMixin
+
+from . import metrics, profiling
+from .snapshot import brotli, choose_encoding
+
+
+COMPRESSED_KEY = 'mainapp:compressed:{}:{}'
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+def media_type(response):
+    return response.get('Content-Type', '').split(';')[0].strip().lower()
+
+
+def is_compressible(response):
+    content_type = media_type(response)
+    if 'no-transform' in response.get('Cache-Control', ''):
+        return False
+    return (
+        content_type.startswith('text/')
+        or content_type in COMPRESSIBLE_TYPES
+        or content_type.endswith(('+json', '+xml'))
+    )
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(
+            data, mode=brotli.MODE_TEXT, quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+    return gzip.compress(data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """
+    Потоковое сжатие: каждый чанк сразу сбрасывается клиенту
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(
+                mode=brotli.MODE_TEXT, quality=settings.COMPRESSION_BROTLI_QUALITY
+            )
+        else:
+            # wbits=31 — формат gzip (заголовок и CRC)
+            self.compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self.compressor.process(chunk) + self.compressor.flush()
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def cached_compress(request, response, encoding):
+    """
+    Сжатое тело ответа; для ответов со строгим ETag — из кэша
+    """
+    etag = response.get('ETag', '')
+    if not etag.startswith('"'):
+        return compress(response.content, encoding)
+
+    digest = hashlib.md5(f'{request.path}:{etag}'.encode()).hexdigest()
+    key = COMPRESSED_KEY.format(encoding, digest)
+    body = cache.get(key)
+    if body is None:
+        body = compress(response.content, encoding)
+        cache.set(key, body, settings.MENU_CACHE_TIMEOUT)
+    return body
+
+
+class MetricsMiddleware:
+    """
+    Задержка, число и время SQL-запросов по маршрутам (mainapp.metrics)
+    и заголовок Server-Timing. Работает и под WSGI, и под ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats, token = metrics.start_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        return metrics.finish_request(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = metrics.start_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        return metrics.finish_request(request, response, stats)
+
+
+class ProfilerMiddleware:
+    """
+    Профилирует запрос по подписанному заголовку X-Profile или флагу
+    ?_profile=1 сотрудника (mainapp.profiling). Ставится после
+    AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if profiling.wanted(request):
+            user = getattr(request, 'user', None)
+            if profiling.authorized(request, user) and profiling.allowed():
+                return profiling.run_profiled(request, self.get_response)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if profiling.wanted(request):
+            user = await request.auser() if hasattr(request, 'auser') else None
+            if profiling.authorized(request, user) and profiling.allowed():
+                return await profiling.arun_profiled(request, self.get_response)
+        return await self.get_response(request)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Сжатие ответов (br/gzip) с выбором кодировки по Accept-Encoding.
+
+    В отличие от django.middleware.gzip.GZipMiddleware:
+    - поддерживает brotli (если установлен пакет brotli);
+    - сжимает только текстовые типы и ответы не меньше COMPRESSION_MIN_SIZE;
+    - сжатое тело ответа со строгим ETag (ответы меню, см. MenuCacheMixin)
+      кэшируется по ETag — одни и те же байты не сжимаются на каждый запрос.
+
+    HTML (админка, browsable API) содержит CSRF-токен, поэтому сжимается
+    самим GZipMiddleware: случайная длина gzip-заголовка — его защита
+    от BREACH.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.html_middleware = GZipMiddleware(get_response)
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or not is_compressible(response):
+            return response
+        if media_type(response) == 'text/html':
+            return self.html_middleware.process_response(request, response)
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), ENCODINGS)
+        if encoding == 'identity':
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            body = cached_compress(request, response, encoding)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response.headers['Content-Length'] = str(len(body))
+
+        # Тело другое — ETag становится слабым, но по-прежнему совпадает
+        # при слабом сравнении If-None-Match (как в GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import migrations
+
+
+FTS_TABLE = 'mainapp_product_fts'
+
+
+def meta_text(meta):
+    """
+    Копия mainapp.search.meta_text: миграция не зависит от кода приложения
+    """
+    if not isinstance(meta, dict):
+        return ''
+    parts = []
+    for key in settings.PRODUCT_SEARCH_META_KEYS:
+        value = meta.get(key)
+        if isinstance(value, (list, tuple)):
+            parts.extend(str(v) for v in value)
+        elif value is not None:
+            parts.append(str(value))
+    return ' '.join(parts)
+
+
+def create_search_index(apps, schema_editor):
+    """
+    FTS5-индекс товаров (только SQLite) вместе с ключами meta
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        "USING fts5(title, description, meta, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    Product = apps.get_model('mainapp', 'Product')
+    products = Product.objects.only('pk', 'title', 'description', 'meta').order_by('pk')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, meta) VALUES (%s, %s, %s, %s)",
+            [(p.pk, p.title, p.description, meta_text(p.meta)) for p in products.iterator()],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0007_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0009_menu_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField(verbose_name='ID товара')),
+                ('action', models.CharField(choices=[('updated', 'Создан или изменён'), ('deleted', 'Удалён')], default='updated', max_length=10, verbose_name='Действие')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'изменение меню',
+                'verbose_name_plural': 'Журнал изменений меню',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainapp', '0010_menuchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Код товара в кассовой системе, ключ для import_menu', max_length=64, null=True, unique=True, verbose_name='Артикул'),
+        ),
+    ]
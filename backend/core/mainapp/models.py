@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Catalog(models.Model):
     """
@@ -17,6 +18,7 @@ class Catalog(models.Model):
         verbose_name="Дата создания", 
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(verbose_name="Дата изменения", auto_now=True)
 
     class Meta:
         verbose_name = "Каталог"
@@ -32,6 +34,14 @@ class Product(models.Model):
     Модель товара/продукта
     """
     title = models.CharField(verbose_name="Название товара", max_length=255)
+    sku = models.CharField(
+        verbose_name="Артикул",
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Код товара в кассовой системе, ключ для import_menu"
+    )
     description = models.TextField(verbose_name="Описание товара", blank=True)
     price = models.DecimalField(
         verbose_name="Цена товара", 
@@ -39,6 +49,12 @@ class Product(models.Model):
         decimal_places=2
     )
     image = models.ImageField(upload_to='Продукты/', verbose_name="Изображение", null=True, blank=True)
+    image_variants = models.JSONField(
+        verbose_name="Варианты изображения",
+        default=dict,
+        blank=True,
+        editable=False
+    )  # например: {'source': 'Продукты/a.jpeg', 'card': {'webp': ..., 'jpeg': ...}}
     meta = models.JSONField(verbose_name="Мета-данные товара", default=dict, blank=True)
     catalog = models.ForeignKey(
         Catalog,
@@ -49,6 +65,7 @@ class Product(models.Model):
         related_name="products"
     )
     created_at = models.DateTimeField(verbose_name="Дата создания", auto_now_add=True)
+    updated_at = models.DateTimeField(verbose_name="Дата изменения", auto_now=True)
 
     class Meta:
         verbose_name = "товар"
@@ -70,6 +87,7 @@ class ProductOption(models.Model):
     )
     name = models.CharField(verbose_name="Название опции", max_length=100)  # например: 'молоко'
     values = models.JSONField(verbose_name="Значения опции", default=list)  # например: ['Цельное','Овсяное','Миндальное']
+    updated_at = models.DateTimeField(verbose_name="Дата изменения", auto_now=True)
 
     class Meta:
         verbose_name = "опцию товара"
@@ -79,6 +97,36 @@ class ProductOption(models.Model):
         return f"{self.product.title} - {self.name}"
 
 
+class MenuChange(models.Model):
+    """
+    Журнал изменений товаров для инкрементальной синхронизации меню.
+
+    id записи — версия меню: клиент запрашивает изменения после последней
+    известной ему версии. Изменение опции пишется как изменение товара,
+    потому что опции отдаются вложенными в товар.
+    """
+    class ActionType(models.TextChoices):
+        UPDATED = "updated", "Создан или изменён"
+        DELETED = "deleted", "Удалён"
+
+    # Не ForeignKey: запись об удалении должна пережить сам товар
+    product_id = models.BigIntegerField(verbose_name="ID товара")
+    action = models.CharField(
+        verbose_name="Действие",
+        max_length=10,
+        choices=ActionType.choices,
+        default=ActionType.UPDATED
+    )
+    created_at = models.DateTimeField(verbose_name="Дата изменения", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "изменение меню"
+        verbose_name_plural = "Журнал изменений меню"
+
+    def __str__(self):
+        return f"#{self.id}: товар {self.product_id} {self.get_action_display()}"
+
+
 class Order(models.Model):
     """
     Модель заказа
@@ -89,6 +137,15 @@ class Order(models.Model):
         ACCEPTED = "accepted", "Принят"
         REJECTED = "rejected", "Отклонен"
         COMPLETED = "completed", "Завершен"
+
+    # Допустимые переходы: из статуса -> в какие статусы
+    TRANSITIONS = {
+        StatusType.CREATED: {StatusType.PAID, StatusType.ACCEPTED, StatusType.REJECTED},
+        StatusType.PAID: {StatusType.ACCEPTED, StatusType.COMPLETED, StatusType.REJECTED},
+        StatusType.ACCEPTED: {StatusType.COMPLETED, StatusType.REJECTED},
+        StatusType.REJECTED: set(),
+        StatusType.COMPLETED: set(),
+    }
     
     telegram_user_id = models.BigIntegerField(verbose_name="ID пользователя Telegram")
     status = models.CharField(
@@ -106,14 +163,31 @@ class Order(models.Model):
     address = models.CharField(verbose_name="Адрес доставки", max_length=512, blank=True)
     extra = models.JSONField(verbose_name="Дополнительная информация", default=dict, blank=True)
     created_at = models.DateTimeField(verbose_name="Дата создания заказа", auto_now_add=True)
+    # Ставится переходом в PAID и не сбрасывается: по статусу accepted/completed
+    # не понять, был ли заказ оплачен (created -> accepted тоже разрешён)
+    paid_at = models.DateTimeField(verbose_name="Дата оплаты", null=True, blank=True)
 
     class Meta:
         verbose_name = "заказ"
         verbose_name_plural = "Заказы"
+        indexes = [
+            # Лента заказов (cursor-пагинация)
+            models.Index(fields=["-created_at", "-id"], name="order_created_idx"),
+            # Заказы пользователя, в том числе с фильтром по статусу
+            models.Index(fields=["telegram_user_id", "-created_at", "-id"], name="order_user_created_idx"),
+            models.Index(fields=["telegram_user_id", "status", "-created_at", "-id"], name="order_user_status_idx"),
+        ]
 
     def __str__(self):
         return f"Заказ #{self.id} - {self.get_status_display()}"
 
+    @classmethod
+    def allowed_sources(cls, new_status):
+        """
+        Статусы, из которых разрешён переход в new_status
+        """
+        return [src for src, targets in cls.TRANSITIONS.items() if new_status in targets]
+
 
 class OrderItem(models.Model):
     """
@@ -147,4 +221,41 @@ class OrderItem(models.Model):
         verbose_name_plural = "Позиции заказов"
 
     def __str__(self):
-        return f"{self.product.title} x{self.quantity} в заказе #{self.order.id}"
\ No newline at end of file
+        return f"{self.product.title} x{self.quantity} в заказе #{self.order.id}"
+
+class OutboxMessage(models.Model):
+    """
+    Исходящее сообщение Telegram Bot API.
+
+    Пишется в той же транзакции, что и изменение заказа, и отправляется
+    отдельным воркером (manage.py send_telegram_outbox).
+    """
+    class StatusType(models.TextChoices):
+        PENDING = "pending", "Ожидает отправки"
+        SENT = "sent", "Отправлено"
+        FAILED = "failed", "Ошибка"
+
+    chat_id = models.BigIntegerField(verbose_name="ID чата Telegram")
+    method = models.CharField(verbose_name="Метод Bot API", max_length=64, default="sendMessage")
+    payload = models.JSONField(verbose_name="Параметры запроса", default=dict)
+    status = models.CharField(
+        verbose_name="Статус отправки",
+        max_length=20,
+        choices=StatusType.choices,
+        default=StatusType.PENDING
+    )
+    attempts = models.PositiveIntegerField(verbose_name="Попыток отправки", default=0)
+    next_attempt_at = models.DateTimeField(verbose_name="Следующая попытка", default=timezone.now)
+    last_error = models.TextField(verbose_name="Последняя ошибка", blank=True)
+    created_at = models.DateTimeField(verbose_name="Дата создания", auto_now_add=True)
+    sent_at = models.DateTimeField(verbose_name="Дата отправки", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "исходящее сообщение"
+        verbose_name_plural = "Исходящие сообщения"
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.method} → {self.chat_id} ({self.get_status_display()})"
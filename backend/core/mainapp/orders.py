@@ -0,0 +1,130 @@
+"""
+Смена статусов заказов.
+
+Единая точка для API и админ-панели. Переходы проверяются по
+Order.TRANSITIONS прямо в условии UPDATE (WHERE status IN (...)), поэтому
+конкурентные запросы не затирают друг друга, а повтор уже применённого
+перехода ничего не пишет. Уведомления пользователям ставятся в outbox
+в той же транзакции.
+"""
+from django.db import transaction
+from django.db.models.functions import Now
+
+from . import telegram
+from .models import Order
+
+
+# Результаты смены статуса для отдельного заказа
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+CONFLICT = 'conflict'
+NOT_FOUND = 'not_found'
+
+
+def status_message(order_id, new_status):
+    """
+    Текст уведомления пользователю о новом статусе заказа
+    """
+    if new_status == Order.StatusType.PAID:
+        return f'Ваш заказ #{order_id} оплачен. Ожидайте подтверждения.'
+    label = Order.StatusType(new_status).label
+    return f'Статус вашего заказа #{order_id}: {label}'
+
+
+def status_update(new_status):
+    """
+    Поля UPDATE для перехода в new_status: при оплате — ещё и paid_at
+    """
+    fields = {'status': new_status}
+    if new_status == Order.StatusType.PAID:
+        fields['paid_at'] = Now()
+    return fields
+
+
+def transition(order_id, new_status, notify=True):
+    """
+    Переводит один заказ в new_status одним условным UPDATE.
+
+    Возвращает пару (результат, текущий статус заказа или None).
+    """
+    with transaction.atomic():
+        updated = (
+            Order.objects
+            .filter(pk=order_id, status__in=Order.allowed_sources(new_status))
+            .update(**status_update(new_status))
+        )
+        if updated:
+            if notify:
+                chat_id = (
+                    Order.objects
+                    .values_list('telegram_user_id', flat=True)
+                    .get(pk=order_id)
+                )
+                telegram.enqueue_message(chat_id, status_message(order_id, new_status))
+            return UPDATED, new_status
+
+    current = Order.objects.filter(pk=order_id).values_list('status', flat=True).first()
+    if current is None:
+        return NOT_FOUND, None
+    if current == new_status:
+        return UNCHANGED, current
+    return CONFLICT, current
+
+
+def change_status(order_ids, new_status, notify=True):
+    """
+    Переводит заказы order_ids в статус new_status.
+
+    Возвращает словарь {id заказа: результат}, где результат —
+    UPDATED, UNCHANGED (статус уже такой), CONFLICT (переход не разрешён)
+    или NOT_FOUND.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    sources = Order.allowed_sources(new_status)
+    results = {}
+
+    with transaction.atomic():
+        current = {
+            pk: (status, chat_id)
+            for pk, status, chat_id in Order.objects
+            .filter(pk__in=order_ids)
+            .values_list('pk', 'status', 'telegram_user_id')
+        }
+        for pk in order_ids:
+            if pk not in current:
+                results[pk] = NOT_FOUND
+            elif current[pk][0] == new_status:
+                results[pk] = UNCHANGED
+            elif current[pk][0] in sources:
+                results[pk] = UPDATED
+            else:
+                results[pk] = CONFLICT
+
+        to_update = [pk for pk, result in results.items() if result == UPDATED]
+        if not to_update:
+            return results
+
+        updated = (
+            Order.objects
+            .filter(pk__in=to_update, status__in=sources)
+            .update(**status_update(new_status))
+        )
+        if updated != len(to_update):
+            # Часть заказов успели изменить между чтением и UPDATE
+            changed = set(
+                Order.objects
+                .filter(pk__in=to_update, status=new_status)
+                .values_list('pk', flat=True)
+            )
+            for pk in to_update:
+                if pk not in changed:
+                    results[pk] = CONFLICT
+            to_update = [pk for pk in to_update if pk in changed]
+
+        if notify:
+            telegram.enqueue_messages(
+                (current[pk][1], status_message(pk, new_status))
+                for pk in to_update
+            )
+
+    return results
@@ -0,0 +1,47 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .links import request_url
+
+
+class MenuPagination(PageNumberPagination):
+    """
+    Постраничный вывод с ссылками от PUBLIC_BASE_URL: страницы меню
+    кэшируются без учёта заголовка Host
+    """
+
+    def get_next_link(self):
+        if not self.page.has_next():
+            return None
+        return replace_query_param(
+            request_url(self.request), self.page_query_param, self.page.next_page_number()
+        )
+
+    def get_previous_link(self):
+        if not self.page.has_previous():
+            return None
+        url = request_url(self.request)
+        page_number = self.page.previous_page_number()
+        if page_number == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, page_number)
+
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Cursor-пагинация заказов в порядке (-created_at, -id), без COUNT(*).
+
+    Это не полноценный keyset по паре (created_at, id): курсор DRF хранит
+    created_at крайнего заказа и смещение среди заказов с тем же
+    created_at, а id только упорядочивает такие заказы. Время создания
+    хранится с микросекундами, совпадения редки, поэтому смещение почти
+    всегда 0 и глубокие страницы стоят как первая. Но если много заказов
+    получили одно время (bulk_create, перенос данных), смещение внутри
+    группы растёт как OFFSET, а вставка или удаление заказов этой группы
+    между запросами может сдвинуть страницу на элемент.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    page_size_query_param = 'page_size'
+    max_page_size = 100
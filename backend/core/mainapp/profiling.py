@@ -0,0 +1,112 @@
+"""
+Профилирование отдельных запросов в продакшене.
+
+Запрос профилируется через cProfile, если:
+- в нём есть заголовок X-Profile с подписанным токеном
+  (manage.py profile_token), или
+- его делает сотрудник (is_staff) с параметром ?_profile=1.
+
+Результат — файл .prof (формат pstats) в PROFILER_DIR: его открывают
+python -m pstats, snakeviz или flameprof (flamegraph). Число
+профилируемых запросов ограничено PROFILER_RATE_LIMIT на все процессы.
+"""
+import cProfile
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+
+
+HEADER = 'X-Profile'
+QUERY_FLAG = '_profile'
+SALT = 'mainapp.profiling'
+TOKEN_VALUE = 'profile'
+RATE_KEY = 'mainapp:profiler:{}'
+
+
+def make_token():
+    return signing.TimestampSigner(salt=SALT).sign(TOKEN_VALUE)
+
+
+def valid_token(token):
+    try:
+        value = signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=settings.PROFILER_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return value == TOKEN_VALUE
+
+
+def wanted(request):
+    """
+    Просит ли запрос профилирования (проверка прав — authorized)
+    """
+    return HEADER in request.headers or request.GET.get(QUERY_FLAG) == '1'
+
+
+def authorized(request, user):
+    token = request.headers.get(HEADER)
+    if token:
+        return valid_token(token)
+    return bool(user is not None and user.is_staff)
+
+
+def allowed():
+    """
+    Не больше PROFILER_RATE_LIMIT профилей за окно (счётчик в общем кэше)
+    """
+    limit, window = settings.PROFILER_RATE_LIMIT
+    key = RATE_KEY.format(int(time.time() // window))
+    cache.add(key, 0, window)
+    try:
+        return cache.incr(key) <= limit
+    except ValueError:  # ключ истёк между add и incr
+        return False
+
+
+def profile_path(request):
+    match = getattr(request, 'resolver_match', None)
+    route = match.view_name if match is not None else request.path
+    route = re.sub(r'[^\w.-]+', '_', route).strip('_')[:80] or 'root'
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S-%f')
+    return os.path.join(settings.PROFILER_DIR, f'{stamp}-{route}-{os.getpid()}.prof')
+
+
+def save(profiler, request, response):
+    """
+    Сохраняет статистику; имя файла — в заголовке ответа X-Profile-File
+    """
+    path = profile_path(request)
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    profiler.dump_stats(path)
+    response['X-Profile-File'] = os.path.basename(path)
+    return response
+
+
+def run_profiled(request, get_response):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        response = get_response(request)
+    finally:
+        profiler.disable()
+    return save(profiler, request, response)
+
+
+async def arun_profiled(request, get_response):
+    """
+    Под ASGI профиль включает всё, что event loop выполнял за время
+    запроса, в том числе чужие запросы
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        response = await get_response(request)
+    finally:
+        profiler.disable()
+    return save(profiler, request, response)
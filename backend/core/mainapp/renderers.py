@@ -0,0 +1,45 @@
+"""
+JSON-рендерер DRF на orjson.
+
+При настройках проекта (компактный JSON, UNICODE_JSON, Decimal как
+число) вывод побайтно совпадает с rest_framework.renderers.JSONRenderer
+для строк, целых, Decimal (цены, суммы) и float в обычной записи: типы,
+которых orjson не знает (Decimal, datetime, lazy-строки и т.п.),
+преобразуются тем же JSONEncoder, что и в DRF. Для форматированного
+вывода (indent, Browsable API) и данных, которые orjson не принимает
+(например, целые больше 64 бит в JSONField), используется стандартный
+рендерер.
+
+Отличия возможны только у float (на практике — в JSONField):
+- очень большие и очень маленькие числа записываются иначе (1e16, а не
+  1e+16; 0.00001, а не 1e-05) — значение то же, меняются только байты;
+- NaN и ±Infinity становятся null, тогда как JSONRenderer падает с
+  ValueError (в JSON таких значений нет).
+Проверять это заранее значит обходить все данные в Python, что съело бы
+выигрыш от orjson.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if indent is not None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Как и DRF, экранируем U+2028/U+2029 — JSON остаётся подмножеством JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,134 @@
+"""
+Полнотекстовый поиск товаров.
+
+На SQLite используется виртуальная таблица FTS5 (создаётся миграцией
+0008_product_search_index), rowid строки индекса равен id товара. Индекс
+обновляется сигналами Product и командой rebuild_search_index. На других
+СУБД поиск откатывается на icontains.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product
+
+
+FTS_TABLE = 'mainapp_product_fts'
+
+# Веса колонок для bm25: title, description, meta
+RANK_WEIGHTS = (10.0, 2.0, 1.0)
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def meta_text(meta):
+    """
+    Текст из ключей meta, перечисленных в PRODUCT_SEARCH_META_KEYS
+    """
+    if not isinstance(meta, dict):
+        return ''
+    parts = []
+    for key in settings.PRODUCT_SEARCH_META_KEYS:
+        value = meta.get(key)
+        if isinstance(value, (list, tuple)):
+            parts.extend(str(v) for v in value)
+        elif value is not None:
+            parts.append(str(value))
+    return ' '.join(parts)
+
+
+def _rows(products):
+    return [
+        (p.pk, p.title, p.description, meta_text(p.meta))
+        for p in products
+    ]
+
+
+def index_products(products):
+    """
+    Добавляет или обновляет товары в индексе
+    """
+    rows = _rows(products)
+    if not rows or not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, meta) VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+
+
+def remove_products(product_ids):
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+
+def rebuild_index(chunk_size=1000):
+    """
+    Полностью перестраивает индекс. Возвращает количество товаров.
+    """
+    if not is_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    products = Product.objects.only('pk', 'title', 'description', 'meta').order_by('pk')
+    count = 0
+    batch = []
+    for product in products.iterator(chunk_size=chunk_size):
+        batch.append(product)
+        if len(batch) >= chunk_size:
+            index_products(batch)
+            count += len(batch)
+            batch = []
+    index_products(batch)
+    return count + len(batch)
+
+
+def match_expression(query):
+    """
+    «капу мол» -> "капу"* "мол"*: все слова, каждое как префикс
+    """
+    words = WORD_RE.findall(query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_ids(query, limit, catalog_id=None):
+    """
+    id товаров, подходящих под запрос, от более релевантных к менее.
+    catalog_id ограничивает поиск одним каталогом (до LIMIT).
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+
+    if not is_enabled():
+        words = WORD_RE.findall(query)
+        condition = Q()
+        for word in words:
+            condition &= Q(title__icontains=word) | Q(description__icontains=word)
+        if catalog_id is not None:
+            condition &= Q(catalog_id=catalog_id)
+        return list(Product.objects.filter(condition).values_list('pk', flat=True)[:limit])
+
+    weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+    where = f"{FTS_TABLE} MATCH %s"
+    params = [expression]
+    if catalog_id is not None:
+        where += f" AND rowid IN (SELECT id FROM {Product._meta.db_table} WHERE catalog_id = %s)"
+        params.append(catalog_id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {where} "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+            [*params, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
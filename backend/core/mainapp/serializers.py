@@ -1,53 +1,285 @@
+from django.core.files.storage import default_storage
+from django.db import models, transaction
 from rest_framework import serializers
+from .links import absolute_url
 from .models import Catalog, Product, ProductOption, Order, OrderItem
 
-class CatalogSerializer(serializers.ModelSerializer):
+
+def split_param(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Выбор полей ответа параметрами GET-запроса:
+
+    - ?fields=id,title — только перечисленные поля
+    - ?view=compact — набор полей Meta.compact_fields
+    - ?expand=options — добавить поля к выбранному набору
+
+    Действует только на сериализатор верхнего уровня (в том числе
+    элементы списка); вложенные сериализаторы отдают свои поля целиком.
+    Невыбранные поля не вычисляются вовсе. Неизвестное имя в fields или
+    expand — ошибка 400, а не пустые объекты в ответе.
+    """
+
+    @classmethod
+    def field_names(cls):
+        """
+        Имена всех полей сериализатора (считаются один раз на класс)
+        """
+        if '_field_names' not in cls.__dict__:
+            cls._field_names = frozenset(cls().fields)
+        return cls._field_names
+
+    @classmethod
+    def requested_fields(cls, request):
+        """
+        Множество выбранных полей или None, если выбраны все
+        """
+        if request is None or request.method != 'GET':
+            return None
+        fields = split_param(request.GET.get('fields'))
+        expand = split_param(request.GET.get('expand'))
+        errors = {}
+        for param, names in (('fields', fields), ('expand', expand)):
+            unknown = names - cls.field_names()
+            if unknown:
+                errors[param] = [f'Неизвестные поля: {", ".join(sorted(unknown))}']
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        if request.GET.get('view') == 'compact':
+            fields |= set(getattr(cls.Meta, 'compact_fields', ()))
+        if not fields:
+            return None
+        return fields | expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        nested = parent is not None and not (
+            isinstance(parent, serializers.ListSerializer) and parent.parent is None
+        )
+        if nested:
+            return fields
+
+        selected = self.requested_fields(self.context.get('request'))
+        if selected is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+class CatalogSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     products_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Catalog
         fields = ['id', 'name', 'actual', 'products_count', 'created_at']
+        compact_fields = ['id', 'name', 'products_count']
     
     def get_products_count(self, obj):
-        return obj.products.count()
+        # Вьюсет аннотирует queryset через Count('products'); запрос на
+        # каждый каталог остаётся только для только что созданных объектов
+        count = getattr(obj, 'products_count', None)
+        if count is None:
+            count = obj.products.count()
+        return count
 
 
 class ProductOptionSerializer(serializers.ModelSerializer):
+    # Без product: опции всегда вложены в свой товар
     class Meta:
         model = ProductOption
-        fields = '__all__'
+        fields = ['id', 'name', 'values']
+
+
+class PublicImageField(serializers.ImageField):
+    """
+    URL изображения от PUBLIC_BASE_URL, а не от хоста запроса
+    """
 
+    def to_representation(self, value):
+        if not value:
+            return None
+        return absolute_url(value.url)
 
-class ProductSerializer(serializers.ModelSerializer):
+
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: PublicImageField,
+    }
     options = ProductOptionSerializer(many=True, read_only=True)
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
         fields = '__all__'
+        # Плитка каталога: без описания, meta и опций
+        compact_fields = ['id', 'title', 'price', 'catalog', 'image_variants']
+
+    def get_image_variants(self, obj):
+        """
+        URL уменьшенных копий: {'card': {'webp': url, 'jpeg': url}, ...}
+        """
+        result = {}
+        for variant, files in (obj.image_variants or {}).items():
+            if variant == 'source':
+                continue
+            result[variant] = {}
+            for ext, name in files.items():
+                result[variant][ext] = absolute_url(default_storage.url(name))
+        return result
+
+
+class MenuCatalogSerializer(serializers.ModelSerializer):
+    """
+    Каталог вместе со всеми товарами — для снимка меню
+    """
+    products = ProductSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Catalog
+        fields = ['id', 'name', 'products']
+
+
+class MenuSnapshotSerializer(serializers.Serializer):
+    """
+    Снимок меню. Товары без каталога — отдельным списком uncatalogued.
+    Всё вложенное, поэтому ?fields= и ?view= на снимок не действуют.
+    """
+    version = serializers.CharField()
+    catalogs = MenuCatalogSerializer(many=True)
+    uncatalogued = ProductSerializer(many=True)
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    # Число вместо PrimaryKeyRelatedField: товары грузятся одним запросом
+    # при создании заказа, а не по запросу на каждую позицию
+    product = serializers.IntegerField(source='product_id', min_value=1)
+
     class Meta:
         model = OrderItem
         fields = ['product','quantity','price','options']
+        read_only_fields = ['price']
+        extra_kwargs = {'quantity': {'min_value': 1}}
+
+
+def load_product_prices(orders_data):
+    """
+    Загружает цены всех товаров из позиций заказов одним IN-запросом.
+    Цене от клиента не доверяем.
+    """
+    product_ids = {
+        item['product_id']
+        for attrs in orders_data
+        for item in attrs['items']
+    }
+    prices = dict(
+        Product.objects.filter(pk__in=product_ids).values_list('pk', 'price')
+    )
+    missing = sorted(product_ids - prices.keys())
+    if missing:
+        raise serializers.ValidationError(
+            {'items': [f'Товар #{pk} не найден' for pk in missing]}
+        )
+    return prices
+
+
+def build_order(attrs, prices):
+    """
+    Собирает несохранённые заказ и его позиции, сразу считая итоговую сумму
+    """
+    attrs = dict(attrs)
+    items_data = attrs.pop('items')
+    order = Order(**attrs)
+    items = []
+    total = 0
+    for it in items_data:
+        price = prices[it['product_id']]
+        qty = it.get('quantity', 1)
+        items.append(OrderItem(
+            order=order,
+            product_id=it['product_id'],
+            quantity=qty,
+            price=price,
+            options=it.get('options', {}),
+        ))
+        total += price * qty
+    order.total = total
+    return order, items
 
 
-class OrderSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True)
+def save_orders(built):
+    """
+    Сохраняет заказы и все их позиции двумя bulk_create.
+    Позиции кладутся в кэш prefetch, чтобы ответ не делал запросов.
+    """
+    orders = Order.objects.bulk_create([order for order, _ in built])
+    all_items = []
+    for order, items in built:
+        for item in items:
+            item.order = order
+        all_items.extend(items)
+        order._prefetched_objects_cache = {'items': items}
+    OrderItem.objects.bulk_create(all_items)
+    return orders
+
+
+class OrderListSerializer(serializers.ListSerializer):
+    """
+    Пакетное создание заказов (POST /orders/batch/)
+    """
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            prices = load_product_prices(validated_data)
+            return save_orders([build_order(attrs, prices) for attrs in validated_data])
+
+
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, allow_empty=False)
     class Meta:
         model = Order
         fields = ['id','telegram_user_id','status','total','address','items']
+        # Статус меняется только через orders.transition (действия set_status,
+        # mark_paid и т.д.): там проверка TRANSITIONS и уведомление в outbox
+        read_only_fields = ['status', 'total']
+        compact_fields = ['id', 'status', 'total']
+        list_serializer_class = OrderListSerializer
 
 
     def create(self, validated_data):
-        items = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        total = 0
-        for it in items:
-            prod = it['product']
-            qty = it.get('quantity',1)
-            price = it.get('price', prod.price)
-            OrderItem.objects.create(order=order, product=prod, quantity=qty, price=price, options=it.get('options',{}))
-            total += price * qty
-            order.total = total
-            order.save()
-        return order
\ No newline at end of file
+        """
+        Один запрос цен, одна вставка заказа (сразу с total)
+        и один bulk_create позиций — в одной транзакции
+        """
+        with transaction.atomic():
+            prices = load_product_prices([validated_data])
+            order, = save_orders([build_order(validated_data, prices)])
+        return order
+
+    def update(self, instance, validated_data):
+        """
+        Сохраняет только переданные поля: полный save() затёр бы статус,
+        изменённый параллельно через orders.transition
+        """
+        if 'items' in validated_data:
+            raise serializers.ValidationError({'items': 'Позиции созданного заказа не изменяются'})
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+
+class BulkStatusSerializer(serializers.Serializer):
+    """
+    Параметры массовой смены статуса заказов
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000,
+    )
+    status = serializers.ChoiceField(choices=Order.StatusType.choices)
@@ -0,0 +1,140 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import cache as menu_cache, changes, images, metrics, search, slowlog, snapshot
+from .models import Catalog, Product, ProductOption
+
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Catalog)
+def catalog_saved(sender, instance, **kwargs):
+    """
+    Изменение каталога влияет только на список каталогов
+    """
+    menu_cache.invalidate(menu_cache.CATALOGS)
+
+
+@receiver(post_delete, sender=Catalog)
+def catalog_deleted(sender, instance, **kwargs):
+    """
+    Удаление каталога обнуляет catalog у товаров (SET_NULL без сигналов),
+    поэтому сбрасываем и товары
+    """
+    menu_cache.invalidate(menu_cache.CATALOGS, menu_cache.PRODUCTS)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """
+    Товар входит в products_count каталогов
+    """
+    menu_cache.invalidate(menu_cache.PRODUCTS, menu_cache.CATALOGS)
+
+
+@receiver([post_save, post_delete], sender=ProductOption)
+def product_option_changed(sender, instance, **kwargs):
+    """
+    Опции вложены в ответ товаров
+    """
+    menu_cache.invalidate(menu_cache.PRODUCTS)
+
+
+@receiver(post_save, sender=Product)
+def product_image_changed(sender, instance, **kwargs):
+    """
+    Новое изображение — строим варианты после фиксации транзакции
+    """
+    if images.needs_variants(instance):
+        transaction.on_commit(lambda: refresh_image_variants(instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def product_image_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: images.delete_variants(instance.image_variants))
+
+
+def refresh_image_variants(product_id):
+    product = Product.objects.filter(pk=product_id).first()
+    if product is not None and images.needs_variants(product):
+        if images.update_variants(product) is not None:
+            changes.record([product.pk])
+            menu_cache.bump_version(menu_cache.PRODUCTS)
+
+
+@receiver(menu_cache.menu_changed)
+def rebuild_snapshot(sender, namespaces, **kwargs):
+    """
+    Снимок меню собирается сразу после смены версии, а не первым запросом.
+    Данные уже зафиксированы, поэтому ошибка сборки не должна долетать до
+    сохранившего их кода: снимок соберёт первый запрос.
+    """
+    try:
+        snapshot.rebuild()
+    except Exception:
+        logger.exception('Не удалось собрать снимок меню')
+
+
+@receiver(post_save, sender=Product)
+def product_search_index(sender, instance, **kwargs):
+    """
+    Индекс поиска обновляется в той же транзакции, что и товар
+    """
+    search.index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def product_search_remove(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def product_change_saved(sender, instance, **kwargs):
+    changes.record([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def product_change_deleted(sender, instance, **kwargs):
+    changes.record([instance.pk], changes.DELETED)
+
+
+@receiver([post_save, post_delete], sender=ProductOption)
+def product_option_change(sender, instance, **kwargs):
+    """
+    Опции отдаются вложенными в товар — меняется товар целиком
+    """
+    changes.record([instance.product_id])
+
+
+@receiver(pre_delete, sender=Catalog)
+def catalog_products_change(sender, instance, **kwargs):
+    """
+    Товары удаляемого каталога теряют catalog (SET_NULL без сигналов)
+    """
+    changes.record(instance.products.values_list('id', flat=True))
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Учёт SQL-запросов в метриках запроса (mainapp.metrics)
+    """
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    """
+    Журнал медленных запросов (mainapp.slowlog), если задан порог
+    """
+    if settings.SLOW_QUERY_THRESHOLD_MS is None:
+        return
+    if slowlog.log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slowlog.log_slow_queries)
@@ -0,0 +1,126 @@
+"""
+Журнал медленных SQL-запросов.
+
+Каждый запрос дольше SLOW_QUERY_THRESHOLD_MS пишется строкой JSON в
+логгер mainapp.slow_queries (файл SLOW_QUERY_LOG, см. LOGGING): время,
+маршрут запроса, отпечаток SQL и — для первого запроса с таким
+отпечатком — план выполнения (EXPLAIN QUERY PLAN на SQLite).
+Сводка: manage.py slow_queries.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.utils import timezone
+
+from . import metrics
+
+
+logger = logging.getLogger('mainapp.slow_queries')
+
+PLAN_KEY = 'mainapp:slowlog:plan:{}'
+
+# Внутренний EXPLAIN не должен сам попадать в журнал
+_explaining = contextvars.ContextVar('mainapp_slowlog_explaining', default=False)
+# Отпечатки, для которых план уже снят этим процессом
+_explained = set()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """
+    SQL без значений: литералы и параметры заменены на ?, списки IN — на (...)
+    """
+    sql = _STRING.sub('?', sql.replace('%s', '?'))
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDERS.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:16]
+
+
+def explain(connection, sql, params):
+    """
+    План выполнения SELECT или None
+    """
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif connection.vendor in ('postgresql', 'mysql'):
+        prefix = 'EXPLAIN '
+    else:
+        return None
+
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return None
+    finally:
+        _explaining.reset(token)
+
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail) — важна только детализация
+        return [row[-1] for row in rows]
+    return [' '.join(str(col) for col in row) for row in rows]
+
+
+def first_time(digest):
+    """
+    Снят ли уже план для отпечатка (в этом процессе или, через кэш, в других)
+    """
+    if digest in _explained:
+        return False
+    _explained.add(digest)
+    return cache.add(PLAN_KEY.format(digest), 1, None)
+
+
+def current_view():
+    stats = metrics.current_stats.get()
+    if stats is None:
+        return None
+    match = getattr(stats.request, 'resolver_match', None)
+    return match.view_name if match is not None else stats.request.path
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """
+    execute_wrapper: пишет в журнал запросы дольше SLOW_QUERY_THRESHOLD_MS
+    """
+    if _explaining.get():
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+        return result
+
+    normalized = normalize(sql)
+    digest = fingerprint(normalized)
+    entry = {
+        'time': timezone.now().isoformat(),
+        'duration_ms': round(duration_ms, 2),
+        'view': current_view(),
+        'fingerprint': digest,
+        'sql': normalized[:2000],
+        'many': many,
+    }
+    is_select = normalized.split(' ', 1)[0].upper() in ('SELECT', 'WITH')
+    if not many and is_select and first_time(digest):
+        entry['plan'] = explain(context['connection'], sql, params)
+    logger.warning(json.dumps(entry, ensure_ascii=False))
+    return result
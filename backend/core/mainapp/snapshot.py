@@ -0,0 +1,135 @@
+"""
+Снимок всего актуального меню одним ответом.
+
+Снимок строится один раз на каждую версию меню (см. mainapp.cache):
+сразу после её смены по сигналу menu_changed, а не при первом запросе.
+URL изображений абсолютные от PUBLIC_BASE_URL, поэтому снимок один для
+всех хостов. Хранится в кэше уже сериализованным и сжатым (gzip и, если
+установлен пакет brotli, br) вместе со строгим ETag. Тела хранятся в
+base64: в кэше только строки, которые отображает и debug_toolbar.
+"""
+import base64
+import gzip
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from . import cache as menu_cache
+from .models import Catalog, Product
+from .renderers import ORJSONRenderer
+from .serializers import MenuSnapshotSerializer
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, остаёмся на gzip
+    brotli = None
+
+
+SNAPSHOT_KEY = 'mainapp:menu:snapshot:{}:{}'
+
+
+def current_version():
+    """
+    Версия снимка зависит и от каталогов, и от товаров
+    """
+    return (
+        menu_cache.get_version(menu_cache.CATALOGS),
+        menu_cache.get_version(menu_cache.PRODUCTS),
+    )
+
+
+def build_snapshot(version):
+    """
+    Сериализует актуальные каталоги с товарами и опциями и товары без
+    каталога, сжимает результат.
+
+    Возвращает словарь с телом в каждой кодировке (base64) и ETag.
+    """
+    products = Product.objects.prefetch_related('options').order_by('id')
+    catalogs = (
+        Catalog.objects
+        .filter(actual=True)
+        .prefetch_related(Prefetch('products', queryset=products))
+    )
+    data = MenuSnapshotSerializer({
+        'version': '{}.{}'.format(*version),
+        'catalogs': catalogs,
+        'uncatalogued': products.filter(catalog=None),
+    }).data
+    raw = ORJSONRenderer().render(data)
+
+    bodies = {
+        'identity': raw,
+        'gzip': gzip.compress(raw, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        bodies['br'] = brotli.compress(raw, mode=brotli.MODE_TEXT, quality=11)
+
+    return {
+        'etag': hashlib.sha256(raw).hexdigest()[:32],
+        'bodies': {enc: base64.b64encode(body).decode() for enc, body in bodies.items()},
+    }
+
+
+def rebuild():
+    """
+    Строит и сохраняет снимок текущей версии меню
+    """
+    version = current_version()
+    snapshot = build_snapshot(version)
+    cache.set(SNAPSHOT_KEY.format(*version), snapshot, settings.MENU_CACHE_TIMEOUT)
+    return snapshot
+
+
+def get_snapshot():
+    """
+    Возвращает снимок текущей версии меню.
+
+    Обычно он уже построен по сигналу menu_changed; строим сами только
+    после холодного старта или вытеснения из кэша.
+    """
+    snapshot = cache.get(SNAPSHOT_KEY.format(*current_version()))
+    if snapshot is None:
+        snapshot = rebuild()
+    return snapshot
+
+
+def body(snapshot, encoding):
+    """
+    Тело снимка в кодировке encoding
+    """
+    return base64.b64decode(snapshot['bodies'][encoding])
+
+
+def variant_etag(etag, encoding):
+    """
+    Строгий ETag для конкретного представления (у сжатых тел — свой)
+    """
+    if encoding == 'identity':
+        return f'"{etag}"'
+    return f'"{etag}-{encoding}"'
+
+
+def choose_encoding(accept_encoding, available):
+    """
+    Выбирает лучшую кодировку из заголовка Accept-Encoding (br > gzip)
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in ('br', 'gzip'):
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if encoding in available and quality > 0:
+            return encoding
+    return 'identity'
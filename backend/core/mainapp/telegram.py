@@ -0,0 +1,345 @@
+"""
+Работа с Telegram Bot API.
+
+Уведомления пользователям не отправляются из запроса: они складываются
+в OutboxMessage и отправляются воркером (manage.py send_telegram_outbox)
+через общий пул соединений с учётом лимитов Telegram.
+"""
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import timedelta
+
+import httpx
+import requests
+from django.conf import settings
+from django.utils import timezone
+from django.utils.http import parse_http_date_safe
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .models import OutboxMessage
+
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = "https://api.telegram.org/bot"
+
+_session = None
+_session_lock = threading.Lock()
+
+# Асинхронные клиенты привязаны к своему event loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_session():
+    """
+    Общая keep-alive сессия для всех запросов к api.telegram.org
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=settings.TELEGRAM_POOL_SIZE,
+                )
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def call(method, payload):
+    """
+    Синхронный вызов метода Bot API с таймаутом.
+    Исключения requests пробрасываются вызывающему.
+    """
+    url = f"{TELEGRAM_API_URL}{settings.TELEGRAM_BOT_TOKEN}/{method}"
+    started = time.perf_counter()
+    try:
+        response = get_session().post(url, json=payload, timeout=settings.TELEGRAM_API_TIMEOUT)
+    except requests.RequestException:
+        metrics.observe_telegram(method, started, 'network')
+        raise
+    metrics.observe_telegram(method, started, response.status_code)
+    return response
+
+
+def get_async_client():
+    """
+    Общий httpx.AsyncClient текущего event loop (keep-alive, с таймаутами)
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        connect, read = settings.TELEGRAM_API_TIMEOUT
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(
+                max_connections=settings.TELEGRAM_POOL_SIZE,
+                max_keepalive_connections=settings.TELEGRAM_POOL_SIZE,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def acall(method, payload):
+    """
+    Асинхронный вызов метода Bot API: запрос не занимает поток.
+    Исключения httpx пробрасываются вызывающему.
+    """
+    url = f"{TELEGRAM_API_URL}{settings.TELEGRAM_BOT_TOKEN}/{method}"
+    started = time.perf_counter()
+    try:
+        response = await get_async_client().post(url, json=payload)
+    except httpx.HTTPError:
+        metrics.observe_telegram(method, started, 'network')
+        raise
+    metrics.observe_telegram(method, started, response.status_code)
+    return response
+
+
+def invoice_payload(order):
+    """
+    Параметры sendInvoice для оплаты заказа
+    """
+    return {
+        'chat_id': order.telegram_user_id,
+        'title': f'Оплата заказа #{order.id}',
+        'description': f'Оплата заказа на сумму {order.total} руб.',
+        'payload': str(order.id),
+        'provider_token': settings.PAYMENT_PROVIDER_TOKEN,
+        'start_parameter': f'order_{order.id}',
+        'currency': 'RUB',
+        'prices': [{
+            'label': f'Заказ #{order.id}',
+            'amount': int(order.total * 100),  # Сумма в копейках
+        }],
+    }
+
+
+def enqueue_message(chat_id, text):
+    """
+    Ставит текстовое сообщение в outbox. Вызывать внутри транзакции,
+    меняющей данные, о которых сообщаем.
+    """
+    return OutboxMessage.objects.create(
+        chat_id=chat_id,
+        method='sendMessage',
+        payload={'chat_id': chat_id, 'text': text},
+    )
+
+
+def enqueue_messages(messages):
+    """
+    Пачкой ставит в outbox сообщения из пар (chat_id, text)
+    """
+    return OutboxMessage.objects.bulk_create([
+        OutboxMessage(
+            chat_id=chat_id,
+            method='sendMessage',
+            payload={'chat_id': chat_id, 'text': text},
+        )
+        for chat_id, text in messages
+    ])
+
+
+class TokenBucket:
+    """
+    Корзина токенов: rate токенов в секунду, не больше capacity про запас
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now=None):
+        """
+        Сколько секунд ждать до появления токена
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now):
+        """
+        Корзина снова полная — она ничем не отличается от новой
+        """
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class RateLimiter:
+    """
+    Лимиты Telegram: общий на бота и отдельный на каждый чат,
+    плюс глобальная пауза по retry_after из ответа 429.
+
+    Корзины чатов хранятся в порядке последнего использования; успевшие
+    заполниться удаляются с начала — новая корзина для чата будет такой же.
+    """
+
+    def __init__(self, global_rate, per_chat_rate):
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.chat_buckets = OrderedDict()
+        self.paused_until = 0.0
+
+    def _evict_idle(self, now):
+        while self.chat_buckets:
+            chat_id, bucket = next(iter(self.chat_buckets.items()))
+            if not bucket.is_full(now):
+                break
+            del self.chat_buckets[chat_id]
+
+    def _chat_bucket(self, chat_id):
+        self._evict_idle(time.monotonic())
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate)
+        else:
+            self.chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def acquire(self, chat_id, sleep=time.sleep):
+        """
+        Блокирует до тех пор, пока отправка в чат не станет разрешена
+        """
+        chat_bucket = self._chat_bucket(chat_id)
+        while True:
+            now = time.monotonic()
+            wait = max(
+                self.paused_until - now,
+                self.global_bucket.wait_time(now),
+                chat_bucket.wait_time(now),
+            )
+            if wait <= 0:
+                self.global_bucket.consume(now)
+                chat_bucket.consume(now)
+                return
+            sleep(wait)
+
+
+def backoff_delay(attempts):
+    """
+    Экспоненциальная задержка с джиттером для повторной отправки
+    """
+    delay = min(
+        settings.TELEGRAM_OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1),
+        settings.TELEGRAM_OUTBOX_BACKOFF_MAX,
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+class OutboxSender:
+    """
+    Отправляет накопившиеся сообщения outbox.
+    Рассчитан на один процесс-воркер.
+    """
+
+    def __init__(self, limiter=None):
+        self.limiter = limiter or RateLimiter(
+            settings.TELEGRAM_RATE_LIMIT_GLOBAL,
+            settings.TELEGRAM_RATE_LIMIT_PER_CHAT,
+        )
+
+    def due_messages(self, limit):
+        return list(
+            OutboxMessage.objects
+            .filter(status=OutboxMessage.StatusType.PENDING, next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'id')[:limit]
+        )
+
+    def run_once(self, limit=None):
+        """
+        Отправляет одну пачку готовых к отправке сообщений.
+        Возвращает количество обработанных сообщений.
+        """
+        messages = self.due_messages(limit or settings.TELEGRAM_OUTBOX_BATCH_SIZE)
+        for message in messages:
+            self.limiter.acquire(message.chat_id)
+            self.send(message)
+        return len(messages)
+
+    def send(self, message):
+        try:
+            response = call(message.method, message.payload)
+        except requests.RequestException as exc:
+            self._retry(message, str(exc))
+            return
+
+        if response.ok:
+            message.status = OutboxMessage.StatusType.SENT
+            message.sent_at = timezone.now()
+            message.attempts += 1
+            message.last_error = ''
+            message.save(update_fields=['status', 'sent_at', 'attempts', 'last_error'])
+            return
+
+        if response.status_code == 429:
+            retry_after = self._retry_after(response)
+            logger.warning('Telegram 429, пауза %s с', retry_after)
+            self.limiter.pause(retry_after)
+            # Превышение лимита — не ошибка сообщения, попытку не засчитываем
+            message.next_attempt_at = timezone.now() + timedelta(seconds=retry_after)
+            message.last_error = response.text[:1000]
+            message.save(update_fields=['next_attempt_at', 'last_error'])
+        elif response.status_code >= 500:
+            self._retry(message, response.text[:1000])
+        else:
+            # 400/403 и т.п.: чат не найден, бот заблокирован — повтор не поможет
+            message.status = OutboxMessage.StatusType.FAILED
+            message.attempts += 1
+            message.last_error = response.text[:1000]
+            message.save(update_fields=['status', 'attempts', 'last_error'])
+
+    def _retry(self, message, error):
+        message.attempts += 1
+        message.last_error = error
+        if message.attempts >= settings.TELEGRAM_OUTBOX_MAX_ATTEMPTS:
+            message.status = OutboxMessage.StatusType.FAILED
+            logger.error('Сообщение outbox #%s не отправлено: %s', message.pk, error)
+        else:
+            message.next_attempt_at = timezone.now() + timedelta(
+                seconds=backoff_delay(message.attempts)
+            )
+        message.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+
+    @staticmethod
+    def _retry_after(response):
+        """
+        Пауза после 429, секунд: parameters.retry_after из тела ответа,
+        иначе заголовок Retry-After (число секунд или HTTP-дата), иначе 1
+        """
+        try:
+            return max(int(response.json()['parameters']['retry_after']), 1)
+        except (ValueError, KeyError, TypeError):
+            pass
+        value = response.headers.get('Retry-After', '').strip()
+        if value.isdigit():
+            return max(int(value), 1)
+        date = parse_http_date_safe(value)
+        if date is not None:
+            return max(math.ceil(date - time.time()), 1)
+        return 1
@@ -1,3 +1,1281 @@
-from django.test import TestCase
+import gzip
+import importlib
+import io
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from telegram_bot.backend_client import BackendClient, BackendError
+
+from . import benchmark, menu_io, profiling, slowlog, telegram
+from . import cache as menu_cache
+from .models import Catalog, Product, ProductOption, Order, OrderItem, OutboxMessage
+from .renderers import ORJSONRenderer
+from .slowlog import normalize
+
+
+API = '/api/v1.0/mainapp/api'
+
+
+def run_with_env(script, env):
+    """
+    Выполняет script в отдельном процессе с переменными env (вместо
+    DJANGO_*, REDIS_*, METRICS_* текущего окружения).
+    Возвращает (код выхода, stdout, stderr).
+    """
+    environ = {k: v for k, v in os.environ.items() if not k.startswith(('DJANGO_', 'REDIS_', 'METRICS_'))}
+    environ.update(env)
+    result = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=settings.BASE_DIR, env=environ, capture_output=True, text=True,
+    )
+    return result.returncode, result.stdout, result.stderr
+
+
+def load_settings(**env):
+    """
+    Импортирует core.settings с переменными env. Возвращает (код выхода, stderr).
+    """
+    code, _, stderr = run_with_env('import core.settings', env)
+    return code, stderr
+
+
+PRODUCTION_ENV = {
+    'DJANGO_ENV': 'production',
+    'DJANGO_SECRET_KEY': 'x' * 50,
+    'DJANGO_ALLOWED_HOSTS': 'shop.example',
+    'PUBLIC_BASE_URL': 'https://shop.example',
+    'REDIS_URL': 'redis://localhost:6379/0',
+    'METRICS_TOKEN': 'secret',
+}
+
+# Печатает то, чем production-профиль отличается от разработки
+PRODUCTION_PROBE = """
+import json, os
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+import django
+django.setup()
+from django.conf import settings
+from django.urls import Resolver404, resolve
+try:
+    resolve('/api/v1.0/schema/')
+    schema = True
+except Resolver404:
+    schema = False
+print(json.dumps({
+    'debug': settings.DEBUG,
+    'toolbar': 'debug_toolbar' in settings.INSTALLED_APPS
+               or any('debug_toolbar' in m for m in settings.MIDDLEWARE),
+    'renderers': settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'],
+    'conn_max_age': settings.DATABASES['default']['CONN_MAX_AGE'],
+    'loaders': settings.TEMPLATES[0]['OPTIONS'].get('loaders', [[None]])[0][0],
+    'schema': schema,
+}))
+"""
+
+
+class ProductionSettingsTests(TestCase):
+    """
+    Профиль DJANGO_ENV=production
+    """
+
+    def test_requires_secret_key(self):
+        env = {k: v for k, v in PRODUCTION_ENV.items() if k != 'DJANGO_SECRET_KEY'}
+        code, stderr = load_settings(**env)
+        self.assertNotEqual(code, 0)
+        self.assertIn('DJANGO_SECRET_KEY', stderr)
+
+    def test_requires_hosts_and_base_url(self):
+        for name in ('DJANGO_ALLOWED_HOSTS', 'PUBLIC_BASE_URL'):
+            env = {k: v for k, v in PRODUCTION_ENV.items() if k != name}
+            code, stderr = load_settings(**env)
+            self.assertNotEqual(code, 0, name)
+            self.assertIn(name, stderr)
+
+    def test_no_debug_machinery(self):
+        code, stdout, stderr = run_with_env(PRODUCTION_PROBE, PRODUCTION_ENV)
+        self.assertEqual(code, 0, stderr)
+        self.assertEqual(json.loads(stdout), {
+            'debug': False,
+            'toolbar': False,
+            'renderers': ['mainapp.renderers.ORJSONRenderer'],
+            'conn_max_age': 600,
+            'loaders': 'django.template.loaders.cached.Loader',
+            'schema': False,
+        })
+
+    def test_development_defaults(self):
+        code, stdout, stderr = run_with_env(PRODUCTION_PROBE, {})
+        self.assertEqual(code, 0, stderr)
+        probe = json.loads(stdout)
+        self.assertTrue(probe['debug'])
+        self.assertTrue(probe['toolbar'])
+        self.assertTrue(probe['schema'])
+
+
+class QueryCountTests(TestCase):
+    """
+    Количество запросов на эндпоинт не должно зависеть от объёма данных
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def create_menu(self, catalogs, products_per_catalog):
+        for c in range(catalogs):
+            catalog = Catalog.objects.create(name=f'Каталог {c}')
+            for p in range(products_per_catalog):
+                product = Product.objects.create(title=f'Товар {c}-{p}', price=100, catalog=catalog)
+                ProductOption.objects.create(product=product, name='молоко', values=['Цельное', 'Овсяное'])
+                ProductOption.objects.create(product=product, name='размер', values=['S', 'M'])
+
+    def create_orders(self, count, items_per_order):
+        product = Product.objects.create(title='Кофе', price=150)
+        for i in range(count):
+            order = Order.objects.create(telegram_user_id=i)
+            for _ in range(items_per_order):
+                OrderItem.objects.create(order=order, product=product, price=150)
+
+    def assert_queries(self, expected, url):
+        cache.clear()
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_products_list(self):
+        # COUNT для пагинации + товары + опции одним prefetch
+        self.create_menu(1, 1)
+        self.assert_queries(3, f'{API}/products/')
+        self.create_menu(3, 10)
+        self.assert_queries(3, f'{API}/products/')
+
+    def test_product_detail(self):
+        self.create_menu(1, 1)
+        product = Product.objects.get()
+        self.assert_queries(2, f'{API}/products/{product.pk}/')
+
+    def test_catalogs_list(self):
+        self.create_menu(1, 1)
+        self.assert_queries(2, f'{API}/catalogs/')
+        self.create_menu(10, 3)
+        self.assert_queries(2, f'{API}/catalogs/')
+
+    def test_catalogs_actual(self):
+        self.create_menu(1, 1)
+        self.assert_queries(1, f'{API}/catalogs/actual/')
+        self.create_menu(10, 3)
+        self.assert_queries(1, f'{API}/catalogs/actual/')
+
+    def test_menu_snapshot(self):
+        # каталоги + товары + опции + товары без каталога (их нет — опции не грузятся)
+        self.create_menu(1, 1)
+        self.assert_queries(4, f'{API}/catalogs/snapshot/')
+        self.create_menu(5, 5)
+        self.assert_queries(4, f'{API}/catalogs/snapshot/')
+
+    def test_orders_list(self):
+        # заказы (cursor-пагинация, без COUNT) + позиции одним prefetch
+        self.create_orders(1, 1)
+        self.assert_queries(2, f'{API}/orders/')
+        self.create_orders(20, 5)
+        self.assert_queries(2, f'{API}/orders/')
+
+    def test_products_compact_view(self):
+        # без опций prefetch не нужен: COUNT + товары
+        self.create_menu(2, 3)
+        self.assert_queries(2, f'{API}/products/?view=compact')
+        product = self.client.get(f'{API}/products/?view=compact').json()['results'][0]
+        self.assertEqual(set(product), {'id', 'title', 'price', 'catalog', 'image_variants'})
+        self.assert_queries(3, f'{API}/products/?view=compact&expand=options')
+
+    def test_products_fields(self):
+        self.create_menu(1, 2)
+        product = self.client.get(f'{API}/products/?fields=id,title').json()['results'][0]
+        self.assertEqual(set(product), {'id', 'title'})
+        product = self.client.get(f'{API}/products/?fields=id&expand=options').json()['results'][0]
+        self.assertEqual(set(product), {'id', 'options'})
+        self.assertEqual(len(product['options']), 2)
+        # expand без fields и view ничего не урезает
+        product = self.client.get(f'{API}/products/?expand=options').json()['results'][0]
+        self.assertIn('description', product)
+
+    def test_products_fields_defer(self):
+        self.create_menu(1, 2)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'{API}/products/?fields=id,title')
+        sql = queries[-1]['sql']
+        for column in ('description', 'meta', 'image_variants'):
+            self.assertNotIn(f'"{column}"', sql)
+        self.assertIn('"title"', sql)
+
+    def test_unknown_fields_rejected(self):
+        self.create_menu(1, 1)
+        response = self.client.get(f'{API}/products/?fields=id,nope&expand=extra')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'fields': ['Неизвестные поля: nope'],
+            'expand': ['Неизвестные поля: extra'],
+        })
+        self.assertEqual(self.client.get(f'{API}/catalogs/?fields=unknown').status_code, 400)
+
+    def test_cached_products_list(self):
+        self.create_menu(2, 2)
+        self.client.get(f'{API}/products/')
+        with self.assertNumQueries(0):
+            self.client.get(f'{API}/products/')
+
+    def test_cache_ignores_host(self):
+        # Подменённый Host не создаёт новую запись и не попадает в ссылки
+        self.create_menu(1, 31)
+        self.client.get(f'{API}/products/')
+        with self.assertNumQueries(0):
+            page = self.client.get(f'{API}/products/', HTTP_HOST='spoofed.example').json()
+        self.assertEqual(page['next'], f'{settings.PUBLIC_BASE_URL}{API}/products/?page=2')
+
+
+class MenuCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidated_after_commit(self):
+        version = menu_cache.get_version(menu_cache.PRODUCTS)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Product.objects.create(title='Латте', price=200)
+            # До фиксации конкурентный запрос не должен закэшировать новые данные
+            self.assertEqual(menu_cache.get_version(menu_cache.PRODUCTS), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(menu_cache.get_version(menu_cache.PRODUCTS), version)
+
+    def test_one_bump_per_transaction(self):
+        bumps = []
+        receiver = lambda sender, namespaces, **kwargs: bumps.append(namespaces)
+        menu_cache.menu_changed.connect(receiver)
+        self.addCleanup(menu_cache.menu_changed.disconnect, receiver)
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(title='Латте', price=200)
+            ProductOption.objects.create(product=product, name='молоко', values=['Цельное', 'Овсяное'])
+            ProductOption.objects.create(product=product, name='размер', values=['S', 'M'])
+        self.assertEqual(bumps, [(menu_cache.CATALOGS, menu_cache.PRODUCTS)])
+
+    def test_production_requires_shared_cache(self):
+        code, stderr = load_settings(**{**PRODUCTION_ENV, 'REDIS_URL': ''})
+        self.assertNotEqual(code, 0)
+        self.assertIn('REDIS_URL', stderr)
+
+
+class SnapshotTests(TestCase):
+    """
+    GET /catalogs/snapshot/
+    """
+    url = f'{API}/catalogs/snapshot/'
+
+    def setUp(self):
+        cache.clear()
+        catalog = Catalog.objects.create(name='Кофе')
+        product = Product.objects.create(title='Латте', price=200, catalog=catalog)
+        Product.objects.filter(pk=product.pk).update(image='products/latte.jpg')
+        Product.objects.create(title='Круассан', price=150)
+
+    def test_absolute_image_urls(self):
+        expected = f'{settings.PUBLIC_BASE_URL}{settings.MEDIA_URL}products/latte.jpg'
+        for host in ('testserver', 'spoofed.example'):
+            menu = self.client.get(self.url, HTTP_HOST=host).json()
+            self.assertEqual(menu['catalogs'][0]['products'][0]['image'], expected)
+
+    def test_built_on_menu_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(title='Эспрессо', price=120)
+        # Снимок собран после фиксации — запрос не обращается к базе
+        with self.assertNumQueries(0):
+            menu = self.client.get(self.url).json()
+        self.assertEqual([p['title'] for p in menu['uncatalogued']], ['Круассан', 'Эспрессо'])
+
+    def test_uncatalogued_products(self):
+        menu = self.client.get(self.url).json()
+        self.assertEqual([p['title'] for p in menu['uncatalogued']], ['Круассан'])
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(DEBUG=True)
+    def test_gzip_with_debug_toolbar(self):
+        self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('uncatalogued', json.loads(gzip.decompress(response.content)))
+
+
+class ImageVariantsTests(TestCase):
+    """
+    Варианты изображения товара строятся после фиксации транзакции
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, name, size=(1200, 800)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'brown').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_variants_generated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(title='Латте', price=200, image=self.upload('latte.png'))
+        product.refresh_from_db()
+        variants = product.image_variants
+        self.assertEqual(variants['source'], product.image.name)
+        for variant, size in (('thumbnail', (96, 96)), ('card', (400, 400)), ('detail', (1080, 720))):
+            for ext, fmt in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+                with default_storage.open(variants[variant][ext]) as f, Image.open(f) as image:
+                    self.assertEqual((image.format, image.size), (fmt, size), variant)
+
+        data = self.client.get(f'{API}/products/{product.pk}/').json()
+        self.assertTrue(data['image_variants']['card']['webp'].startswith(settings.PUBLIC_BASE_URL + '/'))
+
+    def test_old_variants_removed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(title='Латте', price=200, image=self.upload('latte.png'))
+        product.refresh_from_db()
+        old = product.image_variants['card']['webp']
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = self.upload('mocha.png')
+            product.save()
+        product.refresh_from_db()
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(product.image_variants['card']['webp']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertFalse(default_storage.exists(product.image_variants['card']['webp']))
+
+
+class ConditionalGetTests(TestCase):
+    """
+    ETag/Last-Modified для эндпоинтов меню
+    """
+
+    def setUp(self):
+        cache.clear()
+        catalog = Catalog.objects.create(name='Кофе')
+        self.product = Product.objects.create(title='Латте', price=200, catalog=catalog)
+
+    def test_if_none_match(self):
+        url = f'{API}/products/{self.product.pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        url = f'{API}/catalogs/'
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_menu(self):
+        url = f'{API}/products/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = 'Капучино'
+            self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class MenuChangesTests(TestCase):
+    """
+    GET /products/changes/?since=
+    """
+
+    def changes(self, since):
+        response = self.client.get(f'{API}/products/changes/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_delta_since_version(self):
+        catalog = Catalog.objects.create(name='Кофе')
+        latte = Product.objects.create(title='Латте', price=200, catalog=catalog)
+        tea = Product.objects.create(title='Чай', price=100, catalog=catalog)
+        version = self.changes(0)['version']
+
+        ProductOption.objects.create(product=latte, name='молоко', values=['Овсяное'])
+        tea_id = tea.pk
+        tea.delete()
+        delta = self.changes(version)
+        self.assertEqual([p['id'] for p in delta['products']], [latte.pk])
+        self.assertEqual(delta['products'][0]['options'][0]['name'], 'молоко')
+        self.assertEqual(delta['deleted'], [tea_id])
+        self.assertFalse(delta['reset'])
+
+        self.assertEqual(self.changes(delta['version'])['products'], [])
+
+    def test_unknown_version_requires_reset(self):
+        Product.objects.create(title='Латте', price=200)
+        self.assertTrue(self.changes(10 ** 6)['reset'])
+
+
+class SearchTests(TestCase):
+    """
+    GET /products/search/
+    """
+    url = f'{API}/products/search/'
+
+    def setUp(self):
+        cache.clear()
+        self.coffee = Catalog.objects.create(name='Кофе')
+        self.desserts = Catalog.objects.create(name='Десерты')
+        for i in range(5):
+            Product.objects.create(title=f'Капучино {i}', price=200, catalog=self.coffee)
+        self.cake = Product.objects.create(
+            title='Чизкейк', description='капучино в креме', price=250, catalog=self.desserts,
+            meta={'tags': ['сезонный']},
+        )
+
+    def titles(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [p['title'] for p in response.json()]
+
+    def test_prefix_and_meta(self):
+        self.assertEqual(len(self.titles(q='капу')), 6)
+        self.assertEqual(self.titles(q='сезон'), ['Чизкейк'])
+
+    def test_catalog_filter_before_limit(self):
+        # Чизкейк ниже по релевантности, но фильтр по каталогу идёт до LIMIT
+        self.assertEqual(self.titles(q='капучино', limit=1, catalog=self.desserts.pk), ['Чизкейк'])
+
+    def test_limit_clamped(self):
+        self.assertEqual(len(self.titles(q='капучино', limit=0)), 1)
+        self.assertEqual(len(self.titles(q='капучино', limit=-5)), 1)
+        self.assertEqual(len(self.titles(q='капучино', limit=1000)), 6)
+
+
+class OrderCreateTests(TestCase):
+    """
+    Создание заказов: цены с сервера, всё в одной транзакции
+    """
+
+    def setUp(self):
+        self.latte = Product.objects.create(title='Латте', price=Decimal('200.00'))
+        self.croissant = Product.objects.create(title='Круассан', price=Decimal('150.00'))
+
+    def order(self, *items, user=42):
+        return {'telegram_user_id': user, 'address': 'ул. Ленина', 'items': list(items)}
+
+    def test_prices_from_server(self):
+        data = self.order(
+            {'product': self.latte.pk, 'quantity': 2, 'price': 1},
+            {'product': self.croissant.pk, 'price': 1},
+        )
+        data['total'] = 1
+        response = self.client.post(f'{API}/orders/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual(order.total, Decimal('550.00'))
+        self.assertEqual(
+            sorted(order.items.values_list('price', flat=True)), [Decimal('150.00'), Decimal('200.00')]
+        )
+
+    def test_unknown_product(self):
+        response = self.client.post(
+            f'{API}/orders/', self.order({'product': 999}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_batch(self):
+        # цены + заказы + позиции, независимо от размера пачки (плюс SAVEPOINT)
+        batch = [self.order({'product': self.latte.pk}, {'product': self.croissant.pk}, user=i) for i in range(10)]
+        with self.assertNumQueries(5):
+            response = self.client.post(f'{API}/orders/batch/', batch, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 10)
+        self.assertEqual(OrderItem.objects.count(), 20)
+
+    def test_batch_all_or_nothing(self):
+        batch = [self.order({'product': self.latte.pk}), self.order({'product': 999})]
+        response = self.client.post(f'{API}/orders/batch/', batch, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderPaginationTests(TestCase):
+    """
+    Cursor-пагинация заказов в порядке (-created_at, -id)
+    """
+
+    def setUp(self):
+        for i in range(7):
+            Order.objects.create(telegram_user_id=i % 2)
+        # Одинаковое время у части заказов: порядок держится на id
+        Order.objects.filter(pk__lte=4).update(created_at=timezone.now())
+
+    def test_walks_all_pages(self):
+        ids = []
+        url = f'{API}/orders/?page_size=3'
+        while url:
+            page = self.client.get(url).json()
+            self.assertNotIn('count', page)
+            ids.extend(order['id'] for order in page['results'])
+            url = page['next']
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_user_filter_uses_index(self):
+        queryset = Order.objects.filter(telegram_user_id=1).order_by('-created_at', '-id')
+        self.assertIn('order_user_created_idx', queryset.explain())
+        ids = [o['id'] for o in self.client.get(f'{API}/orders/?telegram_user_id=1').json()['results']]
+        self.assertEqual(ids, list(queryset.values_list('pk', flat=True)))
+
+
+class OrderStatusTests(TestCase):
+    """
+    Статус заказа меняется только разрешёнными переходами
+    """
+
+    def setUp(self):
+        product = Product.objects.create(title='Кофе', price=150)
+        self.order = Order.objects.create(telegram_user_id=42)
+        OrderItem.objects.create(order=self.order, product=product, price=150)
+        self.product = product
+
+    def set_status(self, new_status):
+        return self.client.post(
+            f'{API}/orders/{self.order.pk}/set_status/', {'status': new_status}, content_type='application/json'
+        )
+
+    def test_status_read_only(self):
+        response = self.client.post(f'{API}/orders/', {
+            'telegram_user_id': 42, 'status': 'completed', 'items': [{'product': self.product.pk}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], Order.StatusType.CREATED)
+
+        response = self.client.patch(
+            f'{API}/orders/{self.order.pk}/', {'status': 'completed', 'address': 'ул. Ленина'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.StatusType.CREATED)
+        self.assertEqual(self.order.address, 'ул. Ленина')
+
+    def test_illegal_transition(self):
+        response = self.set_status(Order.StatusType.COMPLETED)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['status'], Order.StatusType.CREATED)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_transition_enqueues_message(self):
+        response = self.set_status(Order.StatusType.PAID)
+        self.assertEqual(response.status_code, 200)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.chat_id, 42)
+        self.assertIn(f'#{self.order.pk}', message.payload['text'])
+
+    def test_admin_action_reports_conflicts(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        done = Order.objects.create(telegram_user_id=7, status=Order.StatusType.COMPLETED)
+        response = self.client.post(
+            '/admin/mainapp/order/',
+            {'action': 'mark_as_paid', '_selected_action': [self.order.pk, done.pk]},
+            follow=True,
+        )
+        levels = {str(m): m.level for m in response.context['messages']}
+        self.assertIn('1 заказов отмечены как оплаченные', levels)
+        warning, = [text for text, level in levels.items() if level == messages.WARNING]
+        self.assertIn(f'#{done.pk}', warning)
+
+    def test_admin_accept(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        self.client.post(
+            '/admin/mainapp/order/', {'action': 'mark_as_accepted', '_selected_action': [self.order.pk]}
+        )
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.StatusType.ACCEPTED)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_bulk_status(self):
+        paid = Order.objects.create(telegram_user_id=7, status=Order.StatusType.PAID)
+        done = Order.objects.create(telegram_user_id=8, status=Order.StatusType.COMPLETED)
+        ids = [self.order.pk, paid.pk, done.pk, 999]
+        # SELECT статусов, один условный UPDATE, bulk_create outbox (+ SAVEPOINT/RELEASE)
+        with self.assertNumQueries(5):
+            response = self.client.post(
+                f'{API}/orders/bulk_status/', {'ids': ids, 'status': 'accepted'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'updated': 2,
+            'results': [
+                {'id': self.order.pk, 'result': 'updated'},
+                {'id': paid.pk, 'result': 'updated'},
+                {'id': done.pk, 'result': 'conflict'},
+                {'id': 999, 'result': 'not_found'},
+            ],
+        })
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list('chat_id', flat=True)), [7, 42]
+        )
+        done.refresh_from_db()
+        self.assertEqual(done.status, Order.StatusType.COMPLETED)
+
+    def test_bulk_status_unchanged_not_notified(self):
+        response = self.client.post(
+            f'{API}/orders/bulk_status/', {'ids': [self.order.pk], 'status': 'created'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['results'], [{'id': self.order.pk, 'result': 'unchanged'}])
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_bulk_status_validation(self):
+        response = self.client.post(
+            f'{API}/orders/bulk_status/', {'ids': [], 'status': 'eaten'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'ids', 'status'})
+
+    def mark_paid_via_bot(self):
+        """
+        BackendClient.mark_paid поверх тестового клиента Django
+        """
+        def request(method, url, **kwargs):
+            django_response = self.client.generic(method, url.replace('http://backend', API))
+            response = requests.Response()
+            response.status_code = django_response.status_code
+            response._content = django_response.content
+            return response
+
+        client = BackendClient('http://backend', retries=0)
+        with mock.patch.object(client.session, 'request', side_effect=request):
+            client.mark_paid(self.order.pk)
+
+    def test_bot_mark_paid_after_accept(self):
+        self.set_status(Order.StatusType.PAID)
+        self.set_status(Order.StatusType.ACCEPTED)
+        self.mark_paid_via_bot()
+
+    def test_bot_mark_paid_unpaid_order(self):
+        # Принят без оплаты: 409 не означает, что оплата уже учтена
+        self.set_status(Order.StatusType.ACCEPTED)
+        with self.assertRaises(BackendError) as ctx, self.assertLogs('telegram_bot.backend_client', 'ERROR'):
+            self.mark_paid_via_bot()
+        self.assertEqual(ctx.exception.status, 409)
+        self.assertFalse(ctx.exception.retryable)
+
+
+def telegram_response(status_code, body, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode()
+    response.headers.update(headers or {})
+    return response
+
+
+class FakeClock:
+    """
+    time.monotonic, которое сдвигается только через sleep
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TelegramOutboxTests(TestCase):
+    """
+    Отправка outbox: лимиты, повторы, 429
+    """
+
+    def setUp(self):
+        self.sender = telegram.OutboxSender(telegram.RateLimiter(1000, 1000))
+        self.message = telegram.enqueue_message(42, 'Привет')
+
+    def send(self, response):
+        with mock.patch.object(telegram, 'call', return_value=response) as call:
+            self.sender.run_once()
+        self.message.refresh_from_db()
+        return call
+
+    def test_sent(self):
+        call = self.send(telegram_response(200, {'ok': True}))
+        call.assert_called_once_with('sendMessage', {'chat_id': 42, 'text': 'Привет'})
+        self.assertEqual(self.message.status, OutboxMessage.StatusType.SENT)
+
+    def test_server_error_retried_with_backoff(self):
+        self.send(telegram_response(502, {'ok': False}))
+        self.assertEqual(self.message.status, OutboxMessage.StatusType.PENDING)
+        self.assertEqual(self.message.attempts, 1)
+        self.assertGreater(self.message.next_attempt_at, timezone.now())
+        # Следующая пачка не берёт сообщение до истечения задержки
+        self.assertEqual(self.sender.run_once(), 0)
+
+    @override_settings(TELEGRAM_OUTBOX_BACKOFF_BASE=2, TELEGRAM_OUTBOX_BACKOFF_MAX=60)
+    def test_backoff_delay(self):
+        for attempts, upper in ((1, 2), (3, 8), (10, 60)):
+            delay = telegram.backoff_delay(attempts)
+            self.assertTrue(upper / 2 <= delay <= upper, (attempts, delay))
+
+    def test_too_many_requests(self):
+        with self.assertLogs('mainapp.telegram', 'WARNING'):
+            self.send(telegram_response(429, {'ok': False, 'parameters': {'retry_after': 7}}, {'Retry-After': '3'}))
+        # 429 — не ошибка сообщения: попытка не засчитана, пауза из тела ответа
+        self.assertEqual(self.message.attempts, 0)
+        self.assertGreater(self.sender.limiter.paused_until - time.monotonic(), 6)
+
+    def test_retry_after_header(self):
+        retry_after = telegram.OutboxSender._retry_after
+        self.assertEqual(retry_after(telegram_response(429, {}, {'Retry-After': '5'})), 5)
+        self.assertEqual(retry_after(telegram_response(429, {}, {'Retry-After': 'soon'})), 1)
+        date = http_date(time.time() + 30)
+        self.assertIn(retry_after(telegram_response(429, {}, {'Retry-After': date})), (29, 30))
+
+    def test_rate_limiter_per_chat(self):
+        clock = FakeClock()
+        with mock.patch.object(telegram.time, 'monotonic', clock.monotonic):
+            limiter = telegram.RateLimiter(global_rate=100, per_chat_rate=1)
+            limiter.acquire(1, sleep=clock.sleep)
+            limiter.acquire(2, sleep=clock.sleep)
+            self.assertEqual(clock.slept, [])
+            limiter.acquire(1, sleep=clock.sleep)
+        self.assertEqual(len(clock.slept), 1)
+        self.assertAlmostEqual(clock.slept[0], 1)
+
+    def test_idle_chat_buckets_evicted(self):
+        clock = FakeClock()
+        with mock.patch.object(telegram.time, 'monotonic', clock.monotonic):
+            limiter = telegram.RateLimiter(global_rate=1000, per_chat_rate=1)
+            for chat_id in range(100):
+                limiter.acquire(chat_id, sleep=clock.sleep)
+            clock.sleep(5)
+            limiter.acquire(100, sleep=clock.sleep)
+        self.assertEqual(list(limiter.chat_buckets), [100])
+
+
+BOT_DIR = os.path.join(settings.BASE_DIR, 'telegram_bot')
+
+# Окружение бота в режиме webhook (PENDING_CONFIRMATIONS_DB задаёт тест)
+BOT_ENV = {
+    'BOT_TOKEN': '123456:test-token',
+    'API_BASE': 'http://backend',
+    'TOKEN_URL': 'http://backend/token/',
+    'WEBHOOK_URL': 'https://bot.example/telegram/webhook/',
+    'WEBHOOK_SECRET': 'test-secret',
+}
+
+
+def bot_module(name):
+    """
+    Модуль бота так, как его видит сам бот (python bot.py): соседние
+    модули импортируются напрямую, без пакета telegram_bot
+    """
+    if BOT_DIR not in sys.path:
+        sys.path.append(BOT_DIR)
+    return importlib.import_module(name)
+
+
+def chat_update(update_id, chat_id):
+    return SimpleNamespace(update_id=update_id, message=SimpleNamespace(chat=SimpleNamespace(id=chat_id)))
+
+
+class ChatOrderedDispatcherTests(TestCase):
+    """
+    Апдейты одного чата — по порядку, разных чатов — параллельно
+    """
+
+    def test_order_within_chat(self):
+        dispatcher_module = bot_module('dispatcher')
+        release = threading.Event()
+        other_chat_done = threading.Event()
+        processed = []
+
+        def handle(update):
+            if update.update_id == 1:
+                release.wait(5)
+            processed.append(update.update_id)
+            if update.message.chat.id == 2:
+                other_chat_done.set()
+
+        dispatcher = dispatcher_module.ChatOrderedDispatcher(handle, workers=4)
+        self.addCleanup(dispatcher.shutdown)
+        for update_id, chat_id in ((1, 1), (2, 1), (3, 2), (4, 1)):
+            dispatcher.submit(chat_update(update_id, chat_id))
+
+        # Чат 2 не ждёт медленного апдейта чата 1, а чат 1 — ждёт
+        self.assertTrue(other_chat_done.wait(5))
+        self.assertEqual(processed, [3])
+        release.set()
+        dispatcher.shutdown()
+        self.assertEqual(processed, [3, 1, 2, 4])
+
+    def test_handler_error_does_not_stop_chat(self):
+        dispatcher_module = bot_module('dispatcher')
+        processed = []
+
+        def handle(update):
+            if update.update_id == 1:
+                raise RuntimeError('boom')
+            processed.append(update.update_id)
+
+        dispatcher = dispatcher_module.ChatOrderedDispatcher(handle, workers=2)
+        with self.assertLogs('dispatcher', 'ERROR'):
+            dispatcher.submit(chat_update(1, 1))
+            dispatcher.submit(chat_update(2, 1))
+            dispatcher.shutdown()
+        self.assertEqual(processed, [2])
+
+
+class TelegramWebhookTests(TestCase):
+    """
+    webhook.app принимает только апдейты с секретом WEBHOOK_SECRET
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.mkdtemp()
+        env = {**BOT_ENV, 'PENDING_CONFIRMATIONS_DB': os.path.join(cls.tmp, 'pending.sqlite3')}
+        with mock.patch.dict(os.environ, env):
+            cls.webhook = bot_module('webhook')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+        super().tearDownClass()
+
+    def post(self, token=None, body=b'{"update_id": 1}'):
+        environ = {
+            'PATH_INFO': self.webhook.WEBHOOK_PATH,
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        }
+        if token is not None:
+            environ['HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN'] = token
+        statuses = []
+        with mock.patch.object(self.webhook, 'start_confirmation_replayer'), \
+                mock.patch.object(self.webhook, 'dispatcher') as dispatcher:
+            self.webhook.app(environ, lambda status, headers: statuses.append(status))
+        return statuses[0], dispatcher.submit
+
+    def test_accepts_valid_secret(self):
+        status, submit = self.post(token=BOT_ENV['WEBHOOK_SECRET'])
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(submit.call_args.args[0].update_id, 1)
+
+    def test_rejects_missing_or_wrong_secret(self):
+        for token in (None, '', 'wrong-secret', 'тест'):
+            status, submit = self.post(token=token)
+            self.assertEqual(status, '403 Forbidden', token)
+            submit.assert_not_called()
+
+    def test_secret_required(self):
+        script = 'import sys; sys.path.insert(0, "telegram_bot"); import webhook'
+        db = os.path.join(self.tmp, 'required.sqlite3')
+        for secret in ('', 'with space'):
+            env = {**BOT_ENV, 'WEBHOOK_SECRET': secret, 'PENDING_CONFIRMATIONS_DB': db}
+            code, _, stderr = run_with_env(script, env)
+            self.assertNotEqual(code, 0, secret)
+            self.assertIn('WEBHOOK_SECRET', stderr)
+        env = {k: v for k, v in BOT_ENV.items() if k != 'WEBHOOK_SECRET'}
+        code, _, stderr = run_with_env(script, {**env, 'PENDING_CONFIRMATIONS_DB': db})
+        self.assertNotEqual(code, 0)
+        self.assertIn('WEBHOOK_SECRET', stderr)
+
+
+class PendingConfirmationsTests(TestCase):
+    """
+    Подтверждения оплаты, не дошедшие до backend, повторяются из очереди
+    """
+
+    def setUp(self):
+        self.confirmations = bot_module('confirmations')
+        backend_client = bot_module('backend_client')
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.path = os.path.join(tmp, 'pending.sqlite3')
+        self.queue = self.confirmations.PendingConfirmations(self.path)
+        self.client = backend_client.BackendClient('http://backend', retries=0)
+        self.notify = mock.Mock()
+        self.replayer = self.confirmations.ConfirmationReplayer(self.queue, self.client, self.notify)
+
+    def replay(self, response, later=0):
+        """
+        Один проход повтора; backend отвечает response, часы сдвинуты на later
+        """
+        now = time.time() + later
+        with mock.patch.object(self.client.session, 'request', return_value=response) as request, \
+                mock.patch.object(self.confirmations.time, 'time', return_value=now):
+            self.replayer.replay_once()
+        return request
+
+    def test_failed_call_kept_and_replayed(self):
+        self.queue.add(5, 42, 'timeout')
+        self.replay(telegram_response(503, {}))
+        self.notify.assert_not_called()
+
+        # Запись пережила «перезапуск» и ждёт своей задержки
+        queue = self.confirmations.PendingConfirmations(self.path)
+        self.assertEqual(queue.due(), [])
+        with mock.patch.object(self.confirmations.time, 'time', return_value=time.time() + 3600):
+            self.assertEqual(queue.due(), [('5', 42, 1)])
+        request = self.replay(telegram_response(200, {'status': 'paid'}), later=3600)
+        self.assertEqual(request.call_args.args[:2], ('POST', 'http://backend/orders/5/mark_paid/'))
+        self.notify.assert_called_once_with(42, '5', ok=True)
+        self.assertEqual(self.queue.due(), [])
+
+    def test_removed_after_conflict_with_paid_at(self):
+        # Заказ оплачен и уже принят: 409 с paid_at — подтверждение дошло
+        self.queue.add(5, 42)
+        self.replay(telegram_response(409, {'status': 'accepted', 'paid_at': '2026-01-01T12:00:00Z'}))
+        self.notify.assert_called_once_with(42, '5', ok=True)
+        self.assertEqual(self.queue.due(), [])
+
+    def test_conflict_without_paid_at_reported(self):
+        self.queue.add(5, 42)
+        with self.assertLogs('confirmations', 'ERROR'), self.assertLogs('backend_client', 'ERROR'):
+            self.replay(telegram_response(409, {'status': 'accepted', 'paid_at': None}))
+        self.notify.assert_called_once_with(42, '5', ok=False)
+        self.assertEqual(self.queue.due(), [])
+
+
+class AsyncViewsTests(TestCase):
+    """
+    Асинхронные эндпоинты отвечают так же, как DRF-вьюсеты
+    """
+
+    def setUp(self):
+        cache.clear()
+        catalog = Catalog.objects.create(name='Кофе')
+        for i in range(3):
+            product = Product.objects.create(title=f'Латте {i}', price=200, catalog=catalog)
+            ProductOption.objects.create(product=product, name='молоко', values=['Овсяное'])
+        self.product = product
+        self.order = Order.objects.create(telegram_user_id=42, total=Decimal('200.00'))
+
+    async def test_menu_matches_sync(self):
+        for path in ('catalogs/actual/', 'products/', f'products/{self.product.pk}/'):
+            sync = await sync_to_async(self.client.get)(f'{API}/{path}')
+            response = await self.async_client.get(f'{API}/async/{path}')
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.json(), sync.json(), path)
+
+    async def test_not_modified_and_not_found(self):
+        url = f'{API}/async/products/{self.product.pk}/'
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get(f'{API}/async/products/999/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_set_status(self):
+        url = f'{API}/async/orders/{self.order.pk}/set_status/'
+        response = await self.async_client.post(url, {'status': 'completed'}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        response = await self.async_client.post(url, {'status': 'paid'}, content_type='application/json')
+        self.assertEqual(response.json(), {'status': 'ok', 'result': 'updated'})
+        self.assertEqual(await OutboxMessage.objects.acount(), 1)
+
+    async def test_send_invoice(self):
+        telegram_response = httpx.Response(200, json={'ok': True, 'result': {}})
+        with mock.patch.object(telegram, 'acall', return_value=telegram_response) as acall:
+            response = await self.async_client.post(f'{API}/async/orders/{self.order.pk}/send_invoice/')
+        self.assertEqual(response.json(), {'ok': True, 'resp': {'ok': True, 'result': {}}})
+        method, payload = acall.call_args.args
+        self.assertEqual((method, payload['chat_id'], payload['prices'][0]['amount']), ('sendInvoice', 42, 20000))
+
+
+class ORJSONRendererTests(TestCase):
+
+    def test_output_matches_drf(self):
+        data = {
+            'price': Decimal('149.90'),
+            'total': Decimal('0.00'),
+            'title': 'Латте\u2028',
+            'meta': {'kcal': 120.5, 'tags': ['кофе']},
+            'options': [{'milk': 'oat'}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_float_exponent(self):
+        # Другая запись того же числа: 1e16 вместо 1e+16, 0.00001 вместо 1e-05
+        for value in (1e16, -1e16, 1e-7, 1e-5, 5e-324, 1.7976931348623157e308):
+            data = {'meta': {'value': value}}
+            rendered = ORJSONRenderer().render(data)
+            self.assertEqual(json.loads(rendered), json.loads(JSONRenderer().render(data)), value)
+            self.assertEqual(json.loads(rendered)['meta']['value'], value)
+
+    def test_non_finite_floats(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            data = {'meta': {'value': value}}
+            with self.assertRaises(ValueError):
+                JSONRenderer().render(data)
+            self.assertEqual(ORJSONRenderer().render(data), b'{"meta":{"value":null}}')
+
+    def test_big_int_falls_back(self):
+        data = {'meta': {'value': 2 ** 70}}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class CompressionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for i in range(20):
+            Product.objects.create(title=f'Товар {i}', price=100, description='Описание ' * 10)
+
+    def test_gzip(self):
+        url = f'{API}/products/?format=json'
+        plain = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        # слабый ETag сжатого ответа подходит для условного запроса
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_body_not_compressed(self):
+        response = self.client.get(f'{API}/catalogs/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_html_length_randomized(self):
+        # BREACH: длина сжатого HTML меняется от запроса к запросу, brotli не используется
+        url = f'{API}/products/?format=api'
+        sizes = set()
+        for _ in range(5):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='br, gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            sizes.add(len(response.content))
+        self.assertGreater(len(sizes), 1)
+
+
+class MetricsTests(TestCase):
+    """
+    /metrics и заголовок Server-Timing
+    """
+
+    def test_server_timing(self):
+        response = self.client.get(f'{API}/catalogs/')
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries"')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE', response.content)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_closed_without_token(self):
+        # Тесты идут с DEBUG=False
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_production_requires_token(self):
+        code, stderr = load_settings(**{**PRODUCTION_ENV, 'METRICS_TOKEN': ''})
+        self.assertNotEqual(code, 0)
+        self.assertIn('METRICS_TOKEN', stderr)
+
+
+class SQLiteConnectionTests(TestCase):
+    """
+    Настройки SQLite применяются к каждому новому соединению
+    """
+
+    def test_pragmas(self):
+        # Тестовая база в памяти, WAL проверяем на файловой
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        settings_dict = {**connection.settings_dict, 'NAME': os.path.join(tmp, 'db.sqlite3')}
+        probe = type(connections['default'])(settings_dict, alias='probe')
+        connections['probe'] = probe
+        self.addCleanup(connections.__delitem__, 'probe')
+        self.addCleanup(probe.close)
+
+        with probe.cursor() as cursor:
+            pragmas = {}
+            for name in ('journal_mode', 'busy_timeout', 'synchronous'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'busy_timeout': 20000, 'synchronous': 1})
+
+        statements = []
+        probe.connection.set_trace_callback(statements.append)
+        with transaction.atomic(using='probe'):
+            probe.cursor().execute('SELECT 1')
+        self.assertEqual(statements[0], 'BEGIN IMMEDIATE')
+
+
+class SlowQueryLogTests(TestCase):
+
+    def setUp(self):
+        # Журнал — во временный файл, а не в SLOW_QUERY_LOG
+        self.path = tempfile.mktemp(suffix='.jsonl')
+        handler = logging.FileHandler(self.path, delay=True)
+        self.addCleanup(lambda: os.path.exists(self.path) and os.remove(self.path))
+        self.addCleanup(handler.close)
+        patcher = mock.patch.object(slowlog.logger, 'handlers', [handler])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_slow_query_logged_with_plan(self):
+        Product.objects.create(title='Латте', price=200)
+        cache.clear()
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0), mock.patch.object(slowlog, '_explained', set()):
+            list(Product.objects.filter(title='Латте'))
+        with open(self.path, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        entry = next(e for e in entries if 'mainapp_product' in e['sql'] and e['sql'].startswith('SELECT'))
+        self.assertNotIn('Латте', entry['sql'])
+        self.assertIn('plan', entry)
+
+    def test_normalize_ignores_values(self):
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  LIMIT 21"),
+            normalize('SELECT * FROM t WHERE id IN (%s) AND name = %s LIMIT 30'),
+        )
+
+
+class ProfilerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def test_signed_header_profiles_request(self):
+        with override_settings(PROFILER_DIR=self.dir):
+            response = self.client.get(f'{API}/catalogs/', HTTP_X_PROFILE=profiling.make_token())
+            forged = self.client.get(f'{API}/catalogs/', HTTP_X_PROFILE='profile:forged')
+        self.assertEqual(os.listdir(self.dir), [response['X-Profile-File']])
+        self.assertFalse(forged.has_header('X-Profile-File'))
+
+    def test_rate_limit(self):
+        with override_settings(PROFILER_DIR=self.dir, PROFILER_RATE_LIMIT=(1, 60)):
+            token = profiling.make_token()
+            first = self.client.get(f'{API}/catalogs/', HTTP_X_PROFILE=token)
+            second = self.client.get(f'{API}/catalogs/', HTTP_X_PROFILE=token)
+        self.assertTrue(first.has_header('X-Profile-File'))
+        self.assertFalse(second.has_header('X-Profile-File'))
+
+
+class BenchmarkTests(TestCase):
+
+    def test_scenarios_run_without_errors(self):
+        benchmark.seed(random.Random(1), catalogs=2, products=40, orders=30)
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(Order.objects.count(), 30)
+
+        results = benchmark.run(benchmark.Scenarios.NAMES, random.Random(1), 3, warmup=1)
+        self.assertEqual(list(results), benchmark.Scenarios.NAMES)
+        for name, row in results.items():
+            self.assertEqual(row['errors'], 0, name)
+
+    def test_configured_cache_untouched(self):
+        cache.set('foreign', 'value')
+        benchmark.run(['catalogs_actual'], random.Random(1), 1, warmup=0)
+        self.assertEqual(cache.get('foreign'), 'value')
+
+
+class MenuImportTests(TestCase):
+
+    def import_csv(self, text, **kwargs):
+        importer = menu_io.MenuImporter(**kwargs)
+        importer.run(menu_io.read_csv(io.StringIO(text)))
+        return importer
+
+    def test_upsert_by_sku(self):
+        importer = self.import_csv(
+            'sku,title,price,catalog,options\n'
+            'A1,Латте,150,Кофе,"{""молоко"": [""Цельное"", ""Овсяное""]}"\n'
+            'A2,Чай,90,Чай,\n'
+            'A3,,abc,Чай,\n'
+        )
+        self.assertEqual(importer.stats['created'], 2)
+        self.assertEqual([line for line, _ in importer.errors], [4])
+        latte = Product.objects.get(sku='A1')
+        self.assertEqual(latte.catalog.name, 'Кофе')
+        self.assertEqual(list(latte.options.values_list('values', flat=True)), [['Цельное', 'Овсяное']])
+
+        # Пробный прогон ничего не пишет
+        diff = []
+        self.import_csv('sku,title,price\nA1,Латте,170\n', dry_run=True, on_diff=diff.append)
+        self.assertEqual(diff, ['~ A1: price 150.00 → 170'])
+        self.assertEqual(Product.objects.get(sku='A1').price, Decimal('150'))
+
+        # Колонок catalog и options нет — они не меняются
+        importer = self.import_csv('sku,title,price\nA1,Латте,170\nA2,Чай,90\n')
+        self.assertEqual((importer.stats['updated'], importer.stats['unchanged']), (1, 1))
+        latte.refresh_from_db()
+        self.assertEqual((latte.price, latte.catalog.name, latte.options.count()), (Decimal('170'), 'Кофе', 1))
+
+    def test_errors_capped(self):
+        rows = ''.join(f'B{i},,abc\n' for i in range(50))
+        importer = self.import_csv('sku,title,price\n' + rows, max_errors=5)
+        self.assertEqual([line for line, _ in importer.errors], [2, 3, 4, 5, 6])
+        self.assertEqual(importer.error_count, 50)
+
+    def test_update_goes_through_invalidation(self):
+        self.import_csv('sku,title,price,options\nA1,Латте,150,"{""молоко"": [""Цельное""]}"\n')
+        product = Product.objects.get(sku='A1')
+        option = product.options.get()
+        Product.objects.filter(pk=product.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        ProductOption.objects.filter(pk=option.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        started = timezone.now()
+        version = menu_cache.get_version(menu_cache.PRODUCTS)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_csv('sku,title,price,options\nA1,Латте,170,"{""молоко"": [""Овсяное""]}"\n')
+
+        product.refresh_from_db()
+        option.refresh_from_db()
+        self.assertGreaterEqual(product.updated_at, started)
+        self.assertGreaterEqual(option.updated_at, started)
+        self.assertNotEqual(menu_cache.get_version(menu_cache.PRODUCTS), version)
+        self.assertEqual(self.client.get(f'{API}/products/{product.pk}/').json()['price'], 170)
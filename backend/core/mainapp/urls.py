@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from mainapp import async_views
 from mainapp.views import CatalogViewSet, ProductViewSet, OrderViewSet
 
 # Быстрая регистрация всех ViewSet'ов
@@ -8,6 +9,17 @@ router.register('catalogs', CatalogViewSet)
 router.register('products', ProductViewSet, basename='product')
 router.register('orders', OrderViewSet, basename='order')
 
+# Асинхронные версии эндпоинтов (для запуска под ASGI)
+async_urlpatterns = [
+    path('catalogs/actual/', async_views.catalogs_actual, name='async-catalog-actual'),
+    path('products/', async_views.products_list, name='async-product-list'),
+    path('products/<str:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('orders/<str:pk>/send_invoice/', async_views.order_send_invoice, name='async-order-send-invoice'),
+    path('orders/<str:pk>/mark_paid/', async_views.order_mark_paid, name='async-order-mark-paid'),
+    path('orders/<str:pk>/set_status/', async_views.order_set_status, name='async-order-set-status'),
+]
+
 urlpatterns = [
+    path('api/async/', include(async_urlpatterns)),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
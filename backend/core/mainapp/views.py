@@ -2,45 +2,224 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
 import requests
-import json
+from . import cache as menu_cache, changes, orders, search, snapshot, telegram
 from .models import Catalog, Product, Order
-from .serializers import CatalogSerializer, ProductSerializer, OrderSerializer
+from .pagination import OrderCursorPagination
+from .serializers import CatalogSerializer, ProductSerializer, OrderSerializer, BulkStatusSerializer
 from django_filters.rest_framework import DjangoFilterBackend
 
 
-# Константы для Telegram API
-TELEGRAM_API_URL = "https://api.telegram.org/bot"
-TELEGRAM_BOT_TOKEN = settings.TELEGRAM_BOT_TOKEN
-PAYMENT_PROVIDER_TOKEN = settings.PAYMENT_PROVIDER_TOKEN
+class MenuCacheMixin:
+    """
+    Кэширует данные ответов list/retrieve по параметрам запроса и странице.
+
+    Ключ содержит версию пространства имён cache_namespace, которую
+    сбрасывают сигналы моделей меню (см. mainapp.signals).
 
-class CatalogViewSet(viewsets.ModelViewSet):
+    Ответы несут ETag и Last-Modified той же версии: на повторный запрос
+    с If-None-Match/If-Modified-Since отдаётся 304 без чтения кэша и базы.
+    """
+    cache_namespace = None
+
+    def cached_response(self, request, build):
+        key, etag, last_modified = menu_cache.validators(
+            self.cache_namespace, request, request.accepted_renderer.format
+        )
+        conditional = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if conditional is not None:
+            return conditional
+
+        data = cache.get(key)
+        if data is None:
+            data = build()
+            cache.set(key, data, settings.MENU_CACHE_TIMEOUT)
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        parent = super()
+        return self.cached_response(
+            request, lambda: parent.list(request, *args, **kwargs).data
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super()
+        return self.cached_response(
+            request, lambda: parent.retrieve(request, *args, **kwargs).data
+        )
+
+
+class CatalogViewSet(MenuCacheMixin, viewsets.ModelViewSet):
     """
     Вьюсет для работы с каталогами
     """
-    queryset = Catalog.objects.all()
+    queryset = Catalog.objects.annotate(products_count=Count('products')).order_by('-created_at')
     serializer_class = CatalogSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['actual']
+    cache_namespace = menu_cache.CATALOGS
     
     @action(detail=False, methods=['get'])
     def actual(self, request):
         """
         Эндпоинт для получения только актуальных каталогов
         """
-        actual_catalogs = Catalog.objects.filter(actual=True)
-        serializer = self.get_serializer(actual_catalogs, many=True)
-        return Response(serializer.data)
+        def build():
+            actual_catalogs = self.get_queryset().filter(actual=True)
+            serializer = self.get_serializer(actual_catalogs, many=True)
+            return serializer.data
+
+        return self.cached_response(request, build)
+
+    @action(detail=False, methods=['get'])
+    def snapshot(self, request):
+        """
+        GET /api/catalogs/snapshot/
+
+        **Описание:**
+        Всё актуальное меню одним ответом: каталоги с товарами и опциями.
+        Тело заранее сериализовано и сжато, пересобирается сразу после
+        изменения меню.
 
+        **Заголовки:**
+        - Accept-Encoding: br/gzip — отдаётся готовое сжатое тело
+        - If-None-Match: ETag из прошлого ответа — вернётся 304
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+        **Возвращает:**
+        - version: версия меню
+        - catalogs: список каталогов с вложенными products
+        - uncatalogued: товары без каталога
+        """
+        snap = snapshot.get_snapshot()
+        bodies = snap['bodies']
+        etags = {enc: snapshot.variant_etag(snap['etag'], enc) for enc in bodies}
+        encoding = snapshot.choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), bodies
+        )
+
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if '*' in if_none_match or set(if_none_match) & set(etags.values()):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(snapshot.body(snap, encoding), content_type='application/json')
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+
+        response['ETag'] = etags[encoding]
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class ProductViewSet(MenuCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet для работы с товарами (только чтение)
     """
-    queryset = Product.objects.all()
+    queryset = Product.objects.prefetch_related('options').order_by('id')
     serializer_class = ProductSerializer
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['catalog']  
+    filterset_fields = ['catalog']
+    cache_namespace = menu_cache.PRODUCTS
+
+    def get_queryset(self):
+        """
+        Не читает из базы то, что не попадёт в ответ (?fields=, ?view=compact)
+        """
+        queryset = super().get_queryset()
+        fields = ProductSerializer.requested_fields(self.request)
+        if fields is None:
+            return queryset
+        if 'options' not in fields:
+            queryset = queryset.prefetch_related(None)
+        deferred = {'description', 'meta', 'image_variants'} - fields
+        return queryset.defer(*deferred) if deferred else queryset
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        GET /api/products/search/?q=капу
+
+        **Описание:**
+        Полнотекстовый поиск по названию, описанию и ключам meta
+        (PRODUCT_SEARCH_META_KEYS). Каждое слово ищется как префикс,
+        результаты отсортированы по релевантности.
+
+        **Параметры запроса:**
+        - q: строка поиска
+        - limit: максимум результатов (по умолчанию 20, не больше 100)
+        - catalog: ID каталога (необязательно)
+
+        **Возвращает:**
+        - список товаров
+        """
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+        except ValueError:
+            limit = 20
+
+        def build():
+            # filter_queryset проверяет catalog (400 на неверный ID), а сам
+            # фильтр применяется в поиске до LIMIT
+            queryset = self.filter_queryset(self.get_queryset())
+            catalog = request.query_params.get('catalog')
+            ids = search.search_ids(query, limit, catalog_id=int(catalog) if catalog else None)
+            products = queryset.in_bulk(ids)
+            found = [products[pk] for pk in ids if pk in products]
+            return self.get_serializer(found, many=True).data
+
+        return self.cached_response(request, build)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        GET /api/products/changes/?since=<version>
+
+        **Описание:**
+        Изменения товаров после версии since — для клиентов, которые держат
+        локальную копию меню. Изменённый товар приходит целиком, с опциями;
+        удалённые товары — списком ID.
+
+        **Параметры запроса:**
+        - since: версия из прошлого ответа (0 — все изменения из журнала)
+
+        **Возвращает:**
+        - version: новая версия для следующего запроса
+        - reset: true — журнал не покрывает since, меню нужно загрузить заново
+        - has_more: изменений больше, чем влезло в ответ, — повторить с новой version
+        - products: созданные и изменённые товары
+        - deleted: ID удалённых товаров
+        """
+        try:
+            since = int(request.query_params['since'])
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Параметр since обязателен и должен быть числом'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        delta = changes.changes_since(since, settings.MENU_CHANGES_PAGE_SIZE)
+        products = self.get_queryset().in_bulk(delta['updated'])
+        # Товар мог быть удалён уже после прочитанного фрагмента журнала
+        deleted = delta['deleted'] + [pk for pk in delta['updated'] if pk not in products]
+        return Response({
+            'version': delta['version'],
+            'reset': delta['reset'],
+            'has_more': delta['has_more'],
+            'products': self.get_serializer(list(products.values()), many=True).data,
+            'deleted': sorted(deleted),
+        })
 
 
 class OrderViewSet(viewsets.ModelViewSet):
@@ -49,22 +228,83 @@ class OrderViewSet(viewsets.ModelViewSet):
     
     Предоставляет стандартные CRUD операции для заказов,
     а также дополнительные действия для работы с платежами и статусами.
+    Список отдаётся cursor-пагинацией; заказы пользователя —
+    ?telegram_user_id=...&status=...
     """
-    queryset = Order.objects.all().order_by('-created_at')
+    queryset = Order.objects.prefetch_related('items').order_by('-created_at', '-id')
     serializer_class = OrderSerializer
+    pagination_class = OrderCursorPagination
+    filterset_fields = ['telegram_user_id', 'status']
 
-    def _send_telegram_message(self, chat_id, text):
+    def _transition_response(self, pk, new_status):
         """
-        Вспомогательный метод для отправки сообщений в Telegram
+        Применяет переход статуса одним условным UPDATE и формирует ответ:
+        404 — заказа нет, 409 — переход из текущего статуса запрещён
         """
-        url = f"{TELEGRAM_API_URL}{TELEGRAM_BOT_TOKEN}/sendMessage"
-        payload = {'chat_id': chat_id, 'text': text}
         try:
-            response = requests.post(url, data=payload)
-            return response
-        except requests.RequestException:
-            # Логирование ошибки можно добавить здесь
-            return None
+            order_id = int(pk)
+        except (TypeError, ValueError):
+            raise Http404
+        result, current = orders.transition(order_id, new_status)
+        if result == orders.NOT_FOUND:
+            raise Http404
+        if result == orders.CONFLICT:
+            return Response(
+                {'error': f'Нельзя перевести заказ из статуса {current} в {new_status}',
+                 'status': current},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({'status': 'ok', 'result': result})
+
+    @action(detail=False, methods=['POST'])
+    def batch(self, request):
+        """
+        POST /api/orders/batch/
+
+        **Описание:**
+        Создаёт несколько заказов одним запросом (интеграция с киосками).
+        Все заказы создаются в одной транзакции: при ошибке не создаётся ни один.
+
+        **Тело запроса:**
+        - список заказов в том же формате, что и для POST /api/orders/
+
+        **Возвращает:**
+        - список созданных заказов
+        """
+        serializer = self.get_serializer(
+            data=request.data, many=True, max_length=settings.ORDER_BATCH_MAX_SIZE
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['POST'])
+    def bulk_status(self, request):
+        """
+        POST /api/orders/bulk_status/
+
+        **Описание:**
+        Переводит сразу несколько заказов в указанный статус одним UPDATE
+        и ставит пользователям уведомления в outbox одной пачкой.
+
+        **Обязательные поля в теле запроса:**
+        - ids: список ID заказов
+        - status: новый статус (created/paid/accepted/rejected/completed)
+
+        **Возвращает:**
+        - updated: сколько заказов изменено
+        - results: список {id, result}, где result — updated/unchanged/conflict/not_found
+        """
+        serializer = BulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = orders.change_status(
+            serializer.validated_data['ids'],
+            serializer.validated_data['status'],
+        )
+        return Response({
+            'updated': sum(1 for r in results.values() if r == orders.UPDATED),
+            'results': [{'id': pk, 'result': r} for pk, r in results.items()],
+        })
 
     @action(detail=True, methods=['POST'])
     def send_invoice(self, request, pk=None):
@@ -87,28 +327,16 @@ class OrderViewSet(viewsets.ModelViewSet):
         - resp: ответ от Telegram API или текст ошибки
         """
         order = self.get_object()
-        chat_id = order.telegram_user_id
-
-        # Формируем данные для инвойса
-        prices = [{
-            "label": f"Заказ #{order.id}",
-            "amount": int(order.total * 100)  # Сумма в копейках
-        }]
-        
-        payload = {
-            'chat_id': chat_id,
-            'title': f'Оплата заказа #{order.id}',
-            'description': f'Оплата заказа на сумму {order.total} руб.',
-            'payload': str(order.id),
-            'provider_token': PAYMENT_PROVIDER_TOKEN,
-            'start_parameter': f'order_{order.id}',
-            'currency': 'RUB',
-            'prices': json.dumps(prices)
-        }
+        payload = telegram.invoice_payload(order)
         
-        # Отправляем инвойс через Telegram API
-        url = f"{TELEGRAM_API_URL}{TELEGRAM_BOT_TOKEN}/sendInvoice"
-        response = requests.post(url, data=payload)
+        # Отправляем инвойс через Telegram API (общая сессия, с таймаутом)
+        try:
+            response = telegram.call('sendInvoice', payload)
+        except requests.RequestException as exc:
+            return Response(
+                {'ok': False, 'resp': str(exc)},
+                status=status.HTTP_502_BAD_GATEWAY
+            )
         
         return Response({
             'ok': response.ok, 
@@ -123,22 +351,22 @@ class OrderViewSet(viewsets.ModelViewSet):
         **Описание:**
         Помечает заказ как оплаченный и уведомляет пользователя через Telegram.
         Изменяет статус заказа на 'paid' и отправляет подтверждение.
+        Повторный вызов для оплаченного заказа ничего не меняет.
 
         **Параметры:**
         - id: ID заказа (в URL)
 
         **Возвращает:**
         - status: результат операции ('ok' при успехе)
+        - result: updated или unchanged (статус уже был таким)
+
+        При 409 в ответе текущий status и paid_at — был ли заказ оплачен
+        до того, как ушёл дальше (null — не был).
         """
-        order = self.get_object()
-        order.status = 'paid'
-        order.save()
-        
-        # Отправляем уведомление пользователю
-        message_text = f'Ваш заказ #{order.id} оплачен. Ожидайте подтверждения.'
-        self._send_telegram_message(order.telegram_user_id, message_text)
-        
-        return Response({'status': 'ok'})
+        response = self._transition_response(pk, Order.StatusType.PAID)
+        if response.status_code == status.HTTP_409_CONFLICT:
+            response.data['paid_at'] = Order.objects.values_list('paid_at', flat=True).get(pk=pk)
+        return response
 
     @action(detail=True, methods=['POST'])
     def set_status(self, request, pk=None):
@@ -147,7 +375,7 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         **Описание:**
         Изменяет статус заказа на указанный и уведомляет пользователя через Telegram.
-        Поддерживает все статусы из STATUS_CHOICES модели Order.
+        Разрешены только переходы из Order.TRANSITIONS, иначе — 409.
 
         **Обязательные поля в теле запроса:**
         - status: новый статус заказа (created/paid/accepted/rejected/completed)
@@ -157,8 +385,8 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         **Возвращает:**
         - status: результат операции ('ok' при успехе)
+        - result: updated или unchanged (статус уже был таким)
         """
-        order = self.get_object()
         new_status = request.data.get('status')
         
         if not new_status:
@@ -166,12 +394,10 @@ class OrderViewSet(viewsets.ModelViewSet):
                 {'error': 'Статус не указан'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if new_status not in Order.StatusType.values:
+            return Response(
+                {'error': f'Неизвестный статус: {new_status}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        order.status = new_status
-        order.save()
-        
-        # Отправляем уведомление пользователю
-        message_text = f'Статус вашего заказа #{order.id}: {order.get_status_display()}'
-        self._send_telegram_message(order.telegram_user_id, message_text)
-        
-        return Response({'status': 'ok'})
\ No newline at end of file
+        return self._transition_response(pk, new_status)
\ No newline at end of file
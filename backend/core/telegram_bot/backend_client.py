@@ -0,0 +1,115 @@
+import logging
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Статусы, в которые заказ может уйти после оплаты
+AFTER_PAID = {"accepted", "completed"}
+
+
+class BackendError(Exception):
+    """
+    Ошибка запроса к backend. status — HTTP-код ответа
+    (None при сетевой ошибке), payload — тело ответа, если это JSON.
+    """
+
+    def __init__(self, message, status=None, payload=None):
+        super().__init__(message)
+        self.status = status
+        self.payload = payload or {}
+
+    @property
+    def retryable(self):
+        """
+        Имеет ли смысл повторить запрос позже (404/400 — не имеет)
+        """
+        return self.status is None or self.status in RETRY_STATUSES or self.status >= 500
+
+
+class BackendClient:
+    """
+    Клиент REST API магазина: одна keep-alive сессия на весь бот,
+    таймауты и повторы с экспоненциальной задержкой для идемпотентных
+    запросов.
+    """
+
+    def __init__(self, base_url, timeout=(3.05, 10), retries=3, backoff=0.5, pool_size=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _sleep(self, attempt):
+        time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.0))
+
+    def request(self, method, path, idempotent=False, **kwargs):
+        """
+        Выполняет запрос. Сетевые ошибки и 429/5xx повторяются только для
+        идемпотентных запросов. Возвращает requests.Response с кодом < 400.
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        attempts = self.retries + 1 if idempotent else 1
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if last:
+                    raise BackendError(f"{method} {path}: {exc}") from exc
+                logger.warning("%s %s: %s, повтор", method, path, exc)
+                self._sleep(attempt)
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last:
+                logger.warning("%s %s: HTTP %s, повтор", method, path, response.status_code)
+                self._sleep(attempt)
+                continue
+            if response.status_code >= 400:
+                try:
+                    payload = response.json()
+                except ValueError:
+                    payload = None
+                raise BackendError(
+                    f"{method} {path}: HTTP {response.status_code}",
+                    status=response.status_code,
+                    payload=payload if isinstance(payload, dict) else None,
+                )
+            return response
+
+    def get_order(self, order_id):
+        return self.request("GET", f"/orders/{order_id}/", idempotent=True).json()
+
+    def mark_paid(self, order_id):
+        """
+        Подтверждает оплату заказа. Повтор безопасен: backend не меняет
+        уже оплаченный заказ. 409 считается выполненным подтверждением,
+        только если заказ был оплачен и затем принят или завершён;
+        иначе (например, заказ отклонён) деньги получены за заказ,
+        который не будет выполнен, — ошибка уходит в лог для персонала
+        и пробрасывается дальше.
+        """
+        try:
+            self.request("POST", f"/orders/{order_id}/mark_paid/", idempotent=True)
+        except BackendError as exc:
+            if exc.status != 409:
+                raise
+            current = exc.payload.get("status")
+            if current == "paid" or (current in AFTER_PAID and exc.payload.get("paid_at")):
+                return
+            logger.error(
+                "Оплата заказа %s получена, но заказ в статусе %s: нужна проверка персоналом",
+                order_id, current,
+            )
+            raise
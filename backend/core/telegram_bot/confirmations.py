@@ -0,0 +1,142 @@
+"""
+Локальная очередь неподтверждённых оплат.
+
+Если backend недоступен, подтверждение оплаты не теряется: оно
+сохраняется в SQLite-файл рядом с ботом и повторяется фоновым потоком,
+в том числе после перезапуска бота.
+"""
+import fcntl
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from backend_client import BackendError
+
+
+logger = logging.getLogger(__name__)
+
+
+class PendingConfirmations:
+    """
+    Хранилище подтверждений, которые ещё не дошли до backend
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending_confirmations ("
+                " order_id TEXT PRIMARY KEY,"
+                " chat_id INTEGER NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_attempt_at REAL NOT NULL,"
+                " last_error TEXT NOT NULL DEFAULT '')"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def add(self, order_id, chat_id, error=""):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO pending_confirmations"
+                " (order_id, chat_id, next_attempt_at, last_error) VALUES (?, ?, ?, ?)",
+                (str(order_id), chat_id, time.time(), error),
+            )
+
+    def due(self, limit=50):
+        """
+        Подтверждения, которые пора повторить: [(order_id, chat_id, attempts)]
+        """
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT order_id, chat_id, attempts FROM pending_confirmations"
+                " WHERE next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+
+    def done(self, order_id):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM pending_confirmations WHERE order_id = ?", (str(order_id),))
+
+    def reschedule(self, order_id, delay, error):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE pending_confirmations"
+                " SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?"
+                " WHERE order_id = ?",
+                (time.time() + delay, error, str(order_id)),
+            )
+
+
+class ConfirmationReplayer(threading.Thread):
+    """
+    Фоновый поток: повторяет подтверждения из очереди с экспоненциальной
+    задержкой и сообщает пользователю, когда оплата подтверждена.
+
+    Если задан lock_path, работает только поток процесса, захватившего
+    flock на этом файле; остальные раз в interval пробуют его перехватить
+    (блокировка освобождается, когда процесс-лидер завершается).
+    """
+
+    def __init__(self, queue, client, notify, interval=5.0, max_delay=600.0, lock_path=None):
+        super().__init__(name="confirmations", daemon=True)
+        self.queue = queue
+        self.client = client
+        self.notify = notify
+        self.interval = interval
+        self.max_delay = max_delay
+        self.lock_path = lock_path
+        self.lock_fd = None
+        self.stopped = threading.Event()
+
+    def is_leader(self):
+        if self.lock_path is None or self.lock_fd is not None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self.lock_fd = fd
+        logger.info("Повтор подтверждений оплаты ведёт процесс %s", os.getpid())
+        return True
+
+    def replay_once(self):
+        for order_id, chat_id, attempts in self.queue.due():
+            try:
+                self.client.mark_paid(order_id)
+            except BackendError as exc:
+                if not exc.retryable:
+                    logger.error("Подтверждение заказа %s отклонено: %s", order_id, exc)
+                    self.queue.done(order_id)
+                    self.notify(chat_id, order_id, ok=False)
+                    continue
+                delay = min(self.interval * 2 ** attempts, self.max_delay) * random.uniform(0.5, 1.0)
+                self.queue.reschedule(order_id, delay, str(exc))
+                continue
+            self.queue.done(order_id)
+            self.notify(chat_id, order_id, ok=True)
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    if self.is_leader():
+                        self.replay_once()
+                except Exception:
+                    logger.exception("Ошибка повтора подтверждений оплаты")
+        finally:
+            if self.lock_fd is not None:
+                os.close(self.lock_fd)
+                self.lock_fd = None
+
+    def stop(self):
+        self.stopped.set()
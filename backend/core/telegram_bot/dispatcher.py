@@ -0,0 +1,76 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+def chat_key(update):
+    """
+    Ключ очереди для апдейта: чат или пользователь, от которого он пришёл.
+    Апдейты без чата получают собственный ключ и порядка не ждут.
+    """
+    for name in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        message = getattr(update, name, None)
+        if message is not None:
+            return message.chat.id
+
+    callback_query = getattr(update, "callback_query", None)
+    if callback_query is not None:
+        if callback_query.message is not None:
+            return callback_query.message.chat.id
+        return callback_query.from_user.id
+
+    for name in ("pre_checkout_query", "shipping_query", "inline_query", "chosen_inline_result"):
+        query = getattr(update, name, None)
+        if query is not None:
+            return query.from_user.id
+
+    return ("update", update.update_id)
+
+
+class ChatOrderedDispatcher:
+    """
+    Обрабатывает апдейты в пуле потоков: апдейты одного чата — строго
+    по очереди и в порядке поступления, разные чаты — параллельно.
+
+    Медленный обработчик в одном чате не задерживает остальные: пока чат
+    занят, его новые апдейты копятся в собственной очереди, а не занимают
+    потоки пула.
+    """
+
+    def __init__(self, handler, workers=8):
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="updates")
+        self.lock = threading.Lock()
+        self.pending = {}  # ключ чата -> очередь ещё не обработанных апдейтов
+
+    def submit(self, update):
+        key = chat_key(update)
+        with self.lock:
+            queue = self.pending.get(key)
+            if queue is not None:
+                # Чат уже обрабатывается — апдейт подождёт своей очереди
+                queue.append(update)
+                return
+            self.pending[key] = deque()
+        self.executor.submit(self._drain, key, update)
+
+    def _drain(self, key, update):
+        while True:
+            try:
+                self.handler(update)
+            except Exception:
+                logger.exception("Ошибка обработки апдейта %s", update.update_id)
+
+            with self.lock:
+                queue = self.pending[key]
+                if not queue:
+                    del self.pending[key]
+                    return
+                update = queue.popleft()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,126 @@
+"""
+Бот, общие клиенты и обработчики сообщений.
+
+Модуль импортируют обе точки входа — bot.py (long polling) и webhook.py,
+поэтому TeleBot, BackendClient и очередь подтверждений создаются в
+процессе один раз.
+"""
+import os
+import threading
+
+import telebot
+from telebot import apihelper, types
+from invoices import create_invoice_payload
+from backend_client import BackendClient, BackendError
+from confirmations import PendingConfirmations, ConfirmationReplayer
+from decouple import config
+
+# Токен Telegram-бота
+BOT_TOKEN = config("BOT_TOKEN")
+API_BASE = config("API_BASE")
+token_url = config("TOKEN_URL")
+# Если задан — бот работает через webhook (webhook.py), иначе long polling
+WEBHOOK_URL = config("WEBHOOK_URL", default="")
+
+# В режиме webhook обработчики вызывает ChatOrderedDispatcher,
+# собственный пул потоков telebot не нужен
+bot = telebot.TeleBot(BOT_TOKEN, parse_mode="HTML", threaded=not WEBHOOK_URL)
+
+# Таймауты запросов к Telegram Bot API (telebot по умолчанию ждёт бесконечно)
+apihelper.CONNECT_TIMEOUT = 5
+apihelper.READ_TIMEOUT = 15
+
+# Общий keep-alive клиент backend: таймауты и повторы с задержкой
+backend = BackendClient(API_BASE)
+
+# Подтверждения оплат, не дошедшие до backend, — в локальном файле
+pending_confirmations = PendingConfirmations(
+    config("PENDING_CONFIRMATIONS_DB", default=os.path.join(os.path.dirname(__file__), "pending_confirmations.sqlite3"))
+)
+
+
+def notify_confirmation(chat_id, order_id, ok):
+    if ok:
+        bot.send_message(chat_id, f"✅ Оплата за заказ №{order_id} подтверждена!")
+    else:
+        bot.send_message(chat_id, f"⚠️ Не удалось подтвердить оплату заказа №{order_id}. Мы свяжемся с вами.")
+
+
+# Повторяет подтверждения только процесс, держащий блокировку файла:
+# воркеры gunicorn делят одну очередь
+confirmation_replayer = ConfirmationReplayer(
+    pending_confirmations, backend, notify_confirmation, lock_path=pending_confirmations.path + ".lock"
+)
+_replayer_lock = threading.Lock()
+
+
+def start_confirmation_replayer():
+    """
+    Запускает фоновый повтор подтверждений (один раз на процесс)
+    """
+    if confirmation_replayer.is_alive():
+        return
+    with _replayer_lock:
+        if not confirmation_replayer.is_alive():
+            confirmation_replayer.start()
+
+
+# Старт
+@bot.message_handler(commands=["start"])
+def send_welcome(message):
+    kb = types.InlineKeyboardMarkup()
+    kb.add(types.InlineKeyboardButton("Открыть меню", web_app=types.WebAppInfo(url="http://127.0.0.1:3000/")))
+    bot.send_message(
+        message.chat.id,
+        "Привет 👋\nЯ бот для заказа еды.\nНажми кнопку ниже, чтобы открыть меню:",
+        reply_markup=kb
+    )
+
+
+# Обработка успешной оплаты
+@bot.message_handler(content_types=["successful_payment"])
+def successful_payment(message):
+    payload = message.successful_payment.invoice_payload
+    order_id = payload.split(":")[-1]
+
+    try:
+        backend.mark_paid(order_id)
+    except BackendError as e:
+        if not e.retryable:
+            bot.send_message(message.chat.id, f"⚠️ Ошибка при подтверждении оплаты: {e}")
+            return
+        # Backend недоступен — оплата не теряется, повторим в фоне
+        pending_confirmations.add(order_id, message.chat.id, str(e))
+        bot.send_message(message.chat.id, f"⏳ Оплата за заказ №{order_id} получена, подтверждаем её...")
+        return
+
+    bot.send_message(message.chat.id, f"✅ Оплата за заказ №{order_id} прошла успешно!")
+
+
+# Создание счета (инвойса) для оплаты
+def send_invoice(chat_id: int, order_id: int, title: str = None, description: str = None, amount: int = None):
+    """
+    Отправляет пользователю инвойс (Telegram Payments).
+    amount указывается в копейках (например, 10000 = 100 руб.)
+    Если сумма не передана, заказ запрашивается у backend через общий клиент.
+    """
+    if amount is None:
+        order = backend.get_order(order_id)
+        amount = int(round(float(order["total"]) * 100))
+        title = title or f"Оплата заказа #{order_id}"
+        description = description or f"Оплата заказа на сумму {order['total']} руб."
+
+    payload = create_invoice_payload(order_id)
+    prices = [types.LabeledPrice(label=title, amount=amount)]
+
+    bot.send_invoice(
+        chat_id,
+        title=title,
+        description=description,
+        provider_token=os.getenv("PAYMENT_PROVIDER_TOKEN"),
+        currency="RUB",
+        prices=prices,
+        start_parameter=f"order-{order_id}",
+        invoice_payload=payload
+    )
+
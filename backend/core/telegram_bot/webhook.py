@@ -0,0 +1,113 @@
+"""
+Приём апдейтов бота через webhook.
+
+WSGI-приложение `app` можно запустить любым WSGI-сервером
+(gunicorn webhook:app) или напрямую: python webhook.py — тогда
+регистрируется webhook и поднимается встроенный многопоточный сервер.
+Бот и общие клиенты — в handlers.py.
+
+Ответ Telegram отдаётся сразу, а апдейт уходит в ChatOrderedDispatcher:
+сообщения одного чата обрабатываются по порядку, разных — параллельно.
+"""
+import hmac
+import logging
+import re
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, make_server
+
+from decouple import config
+from telebot import types
+
+from handlers import bot, start_confirmation_replayer, WEBHOOK_URL
+from dispatcher import ChatOrderedDispatcher
+
+
+logger = logging.getLogger(__name__)
+
+# Обязателен: без него любой, кто знает адрес webhook, может прислать
+# поддельный апдейт, в том числе successful_payment
+WEBHOOK_SECRET = config("WEBHOOK_SECRET")
+if not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", WEBHOOK_SECRET):
+    # Ограничения Telegram для secret_token
+    raise ValueError("WEBHOOK_SECRET: от 1 до 256 символов A-Z, a-z, 0-9, _ и -")
+WEBHOOK_PATH = config("WEBHOOK_PATH", default="/telegram/webhook/")
+WEBHOOK_HOST = config("WEBHOOK_HOST", default="0.0.0.0")
+WEBHOOK_PORT = config("WEBHOOK_PORT", default=8443, cast=int)
+WEBHOOK_WORKERS = config("WEBHOOK_WORKERS", default=16, cast=int)
+MAX_BODY_SIZE = 1024 * 1024
+
+
+def process_update(update):
+    bot.process_new_updates([update])
+
+
+dispatcher = ChatOrderedDispatcher(process_update, workers=WEBHOOK_WORKERS)
+
+
+def _respond(start_response, status):
+    start_response(status, [("Content-Type", "text/plain"), ("Content-Length", "0")])
+    return [b""]
+
+
+def app(environ, start_response):
+    """
+    WSGI-приложение webhook
+    """
+    # Не при импорте: потоки не переживают fork воркеров gunicorn (--preload).
+    # Из нескольких воркеров очередь повторяет один (см. ConfirmationReplayer)
+    start_confirmation_replayer()
+    if environ.get("PATH_INFO") != WEBHOOK_PATH:
+        return _respond(start_response, "404 Not Found")
+    if environ.get("REQUEST_METHOD") != "POST":
+        return _respond(start_response, "405 Method Not Allowed")
+
+    token = environ.get("HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN", "")
+    if not hmac.compare_digest(token.encode(), WEBHOOK_SECRET.encode()):
+        return _respond(start_response, "403 Forbidden")
+
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    if not 0 < length <= MAX_BODY_SIZE:
+        return _respond(start_response, "400 Bad Request")
+
+    try:
+        update = types.Update.de_json(environ["wsgi.input"].read(length).decode("utf-8"))
+    except ValueError:
+        logger.warning("Некорректный апдейт в webhook")
+        return _respond(start_response, "400 Bad Request")
+
+    dispatcher.submit(update)
+    return _respond(start_response, "200 OK")
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def serve():
+    """
+    Регистрирует webhook в Telegram и запускает встроенный сервер
+    """
+    bot.remove_webhook()
+    bot.set_webhook(
+        url=WEBHOOK_URL,
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_WORKERS,
+        # Накопившиеся апдейты не сбрасываем: среди них могут быть
+        # successful_payment, а повторное подтверждение оплаты безопасно
+        # (mark_paid идемпотентен)
+        drop_pending_updates=False,
+    )
+    start_confirmation_replayer()
+    print(f"🤖 Бот запущен (webhook {WEBHOOK_URL}, порт {WEBHOOK_PORT})...")
+    with make_server(WEBHOOK_HOST, WEBHOOK_PORT, app, server_class=ThreadingWSGIServer) as server:
+        try:
+            server.serve_forever()
+        finally:
+            dispatcher.shutdown()
+
+
+if __name__ == "__main__":
+    serve()
@@ -7,6 +7,12 @@ export const getProducts = async () => {
   return res.data;
 };
 
+// Всё меню одним ответом (каталоги с товарами), кэшируется по ETag
+export const getMenu = async () => {
+  const res = await axios.get(`${API_URL}/catalogs/snapshot/`);
+  return res.data;
+};
+
 export const createOrder = async (order) => {
   const res = await axios.post(`${API_URL}/orders/`, order);
   return res.data;
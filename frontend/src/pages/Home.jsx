@@ -1,5 +1,5 @@
 import { useEffect, useState, useContext } from "react";
-import { getProducts } from "../api/api";
+import { getMenu } from "../api/api";
 import { CartContext } from "../context/CartContext";
 import Sidebar from "../components/Sidebar";
 import ProductCard from "../components/ProductCard";
@@ -13,10 +13,13 @@ export default function Home() {
   const { addToCart } = useContext(CartContext);
 
   useEffect(() => {
-    getProducts().then((data) => {
+    getMenu().then((menu) => {
+      const data = menu.catalogs
+        .flatMap((c) => c.products.map((p) => ({ ...p, category: c.id })))
+        .concat(menu.uncatalogued.map((p) => ({ ...p, category: null })));
       setProducts(data);
       setFiltered(data);
-      setCategories([...new Set(data.map((p) => ({ id: p.category, name: p.category })))]); 
+      setCategories(menu.catalogs.map((c) => ({ id: c.id, name: c.name })));
     });
   }, []);
 